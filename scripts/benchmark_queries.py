@@ -0,0 +1,50 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+# Benchmark against the offline LLM stub unless a backend is chosen explicitly
+os.environ.setdefault("LLM_BACKEND", "stub")
+
+from src.utils.logging_utils import setup_logger
+from src.query_processor import query_processor
+
+logger = setup_logger()
+
+DEFAULT_QUERIES = [
+    "How does parse_code_file work?",
+    "What does the IngestionManager do with deleted files?",
+    "How do I run the initial indexing?",
+    "Explain the configuration options for FAISS.",
+]
+
+# Usage: benchmark_queries.py [queries file, one per line] [repeats]
+queries = DEFAULT_QUERIES
+if len(sys.argv) > 1:
+    with open(sys.argv[1], "r", encoding="utf-8") as f:
+        queries = [line.strip() for line in f if line.strip()]
+repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+# Every run should pay for retrieval and the LLM call, not hit cached answers
+query_processor.response_cache = None
+query_processor.warm_up()
+
+totals, llm_times, retrieval_times = [], [], []
+for _ in range(repeats):
+    for query in queries:
+        llm_seconds = query_processor.llm_client.seconds
+        start_time = time.perf_counter()
+        query_processor.answer_query(query)
+        total = time.perf_counter() - start_time
+        llm = query_processor.llm_client.seconds - llm_seconds
+        totals.append(total)
+        llm_times.append(llm)
+        retrieval_times.append(total - llm)
+
+logger.info(f"{len(totals)} queries ({len(queries)} x {repeats}), {query_processor.llm_client.calls} LLM calls.")
+for label, samples in (("total", totals), ("llm", llm_times), ("pipeline (total - llm)", retrieval_times)):
+    p50, p95 = np.percentile(samples, [50, 95])
+    logger.info(f"{label}: p50 {p50 * 1000:.0f} ms, p95 {p95 * 1000:.0f} ms, max {max(samples) * 1000:.0f} ms")
+
+sys.exit(0)
@@ -0,0 +1,22 @@
+import sys
+
+from src.utils.logging_utils import setup_logger
+from src.utils.mongodb_utils import ensure_indexes, explain_query_shapes
+
+logger = setup_logger()
+
+# Make sure the indexes exist, then confirm every retrieval query shape uses one
+ensure_indexes()
+
+collscans = []
+for name, stages in explain_query_shapes().items():
+    logger.info(f"{name}: {' -> '.join(stages) or 'no plan'}")
+    if "COLLSCAN" in stages:
+        collscans.append(name)
+
+if collscans:
+    logger.error(f"Query shapes still doing a collection scan: {', '.join(collscans)}")
+    sys.exit(1)
+
+logger.info("All query shapes are served by indexes.")
+sys.exit(0)
@@ -3,30 +3,37 @@ import sys
 from src.utils.config_loader import load_config
 from src.utils.logging_utils import setup_logger
 
-from src.utils.mongodb_utils import insert_metadata
+from src.utils.mongodb_utils import insert_metadata, ensure_indexes
 from src.utils.graphdb_utils import create_graph, save_graph
 from src.ingestion.ingestion_manager import IngestionManager
 
 logger = setup_logger()
 config = load_config()
 
-# Insert initial metadata into MongoDB (can be run once)
-metadata_example = [
-    {"function_name": "processData", "file_path": "src/utils/data_processing.py", "api_reference": "docs/api/data_processing.md"}
-]
-insert_metadata(metadata_example)
-logger.info("Inserted initial metadata into MongoDB.")
+ensure_indexes()
 
-# Create and save initial graph
-graph = create_graph()
-save_graph(graph)
-logger.info("Created initial NetworkX graph.")
+# Incremental runs build on the stores left by previous runs, so only seed them on a full run.
+# A full run also starts from empty FAISS indices, file metadata and manifest (see IngestionManager).
+incremental = config.get("ingestion", {}).get("incremental", False)
+
+if not incremental:
+    # Insert initial metadata into MongoDB (can be run once)
+    metadata_example = [
+        {"function_name": "processData", "file_path": "src/utils/data_processing.py", "api_reference": "docs/api/data_processing.md"}
+    ]
+    insert_metadata(metadata_example)
+    logger.info("Inserted initial metadata into MongoDB.")
+
+    # Create and save initial graph
+    graph = create_graph()
+    save_graph(graph)
+    logger.info("Created initial NetworkX graph.")
 
 # Initialize indexers and ingestion
 repo_path = "data/scRNA-seq-RAG-app"
 # repo_path = "data/redditwarp"
 
-ingestion = IngestionManager(repo_path)
+ingestion = IngestionManager(repo_path, incremental=incremental)
 
 # Run the indexing
 ingested_data = ingestion.ingest()
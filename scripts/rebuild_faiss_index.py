@@ -0,0 +1,17 @@
+import sys
+
+from src.utils.config_loader import load_config
+from src.utils.logging_utils import setup_logger
+from src.utils.embedding_utils import rebuild_faiss_index, CODE_INDEX, DOC_INDEX
+
+logger = setup_logger()
+config = load_config()
+
+# Rebuild the existing indices into the type given on the command line, or faiss.index_type from config.yaml
+index_type = sys.argv[1] if len(sys.argv) > 1 else config["faiss"].get("index_type", "Flat")
+index_names = sys.argv[2:] or [CODE_INDEX, DOC_INDEX]
+for name in index_names:
+    logger.info(f"Rebuilding FAISS index '{name}' as {index_type}.")
+    rebuild_faiss_index(index_type, name)
+
+sys.exit(0)
@@ -2,62 +2,108 @@ import torch
 from transformers import RobertaModel, RobertaTokenizer
 import numpy as np
 
+from src.utils.config_loader import load_config
+from src.utils.embedding_cache import get_embedding_cache
+from src.utils.embedding_utils import CODE_INDEX
+from .encoding_utils import mean_pool, token_budget_batches
+
+# Load configuration once when module is imported
+_config = load_config().get("embedding", {})
+
 class CodeBERTIndexer:
-    def __init__(self, model_name="microsoft/codebert-base", embedding_dim=768):
+    def __init__(self, model_name="microsoft/codebert-base", embedding_dim=768, batch_size=None, max_batch_tokens=None):
         # Initialize model and tokenizer
         self.tokenizer = RobertaTokenizer.from_pretrained(model_name)
         self.model = RobertaModel.from_pretrained(model_name)
+        self.model_name = model_name
         self.embedding_dim = embedding_dim
-        self.id_count = -1  # This will store file paths corresponding to FAISS index entries.
+        self.batch_size = batch_size or _config.get("batch_size", 16)
+        self.max_batch_tokens = max_batch_tokens or _config.get("max_batch_tokens", 8192)
+        self.cache = get_embedding_cache()
 
-    def set_index_value(self, updated_id_count: int):
-        self.id_count = updated_id_count
-
-    def encode_code(self, code: str):
+    def encode_code(self, code: str, use_cache=False):
         """Encodes code using CodeBERT to produce a vector representation."""
-        inputs = self.tokenizer(code, return_tensors="pt", truncation=True, padding=True, max_length=512)
+        return self.encode_codes([code], use_cache)[0]
+
+    def encode_codes(self, codes, use_cache=False):
+        """
+        Encodes several code snippets in batched forward passes; returns an (n, d) matrix.
+        Queries bypass the embedding cache unless use_cache is set, so they neither
+        serialize on its lock nor evict ingestion embeddings.
+        """
+        if not codes:
+            return np.empty((0, self.embedding_dim), dtype=np.float32)
+        input_ids = self.tokenizer(list(codes), truncation=True, max_length=512)["input_ids"]
+        return np.vstack(self.embed_input_ids(input_ids, use_cache))
+
+    def warm_up(self):
+        """Runs one uncached forward pass so lazy initialisation is paid before the first query."""
+        inputs = self.tokenizer(["warm up"], return_tensors="pt")
         with torch.no_grad():
-            outputs = self.model(**inputs)
-        return outputs.last_hidden_state.mean(dim=1).cpu().numpy().flatten()
-    
-    def encode_code_by_chunks(self, code: str, chunk_size=512):
-        """Encodes code in chunks to get multiple embeddings per file."""
+            self.model(**inputs)
+
+    def tokenize_code_chunks(self, code: str, chunk_size=512):
+        """Splits code into chunks of chunk_size tokens and returns the model input ids of each chunk."""
         tokens = self.tokenizer.tokenize(code)
         chunks = [tokens[i:i + chunk_size] for i in range(0, len(tokens), chunk_size)]
+        if not chunks:
+            return []
+
+        encoded = self.tokenizer(
+            chunks,
+            truncation=True,
+            max_length=512,
+            is_split_into_words=True,
+        )
+        return encoded["input_ids"]
 
-        embeddings = []
-        for chunk in chunks:
-            inputs = self.tokenizer(
-                chunk,
-                return_tensors="pt",
-                truncation=True,
-                padding=True,
-                max_length=512,
-                is_split_into_words=True,
-            )
+    def embed_input_ids(self, input_ids, use_cache=True, on_batch=None):
+        """
+        Runs CodeBERT over token id sequences in padded batches of at most batch_size
+        sequences and max_batch_tokens padded tokens, returning one embedding per sequence.
+        With use_cache, sequences found in the embedding cache are not recomputed.
+        on_batch(lengths), if given, is called with the sequence lengths of every batch run.
+        """
+        cache = self.cache if use_cache else None
+        if cache:
+            embeddings = cache.get_many(self.model_name, input_ids)
+        else:
+            embeddings = [None] * len(input_ids)
+        missing = [position for position, embedding in enumerate(embeddings) if embedding is None]
+        lengths = [len(input_ids[position]) for position in missing]
 
+        for batch in token_budget_batches(lengths, self.batch_size, self.max_batch_tokens):
+            positions = [missing[i] for i in batch]
+            if on_batch:
+                on_batch([lengths[i] for i in batch])
+            inputs = self.tokenizer.pad({"input_ids": [input_ids[position] for position in positions]}, return_tensors="pt")
             with torch.no_grad():
                 outputs = self.model(**inputs)
-                chunk_embedding = outputs.last_hidden_state.mean(dim=1)
-                embeddings.append(chunk_embedding.squeeze(0).cpu().numpy())
+            pooled = mean_pool(outputs.last_hidden_state, inputs["attention_mask"]).cpu().numpy()
+            for position, embedding in zip(positions, pooled):
+                embeddings[position] = embedding
 
+        if cache and missing:
+            cache.put_many(self.model_name, [input_ids[position] for position in missing],
+                                [embeddings[position] for position in missing])
         return embeddings
 
+    def encode_code_by_chunks(self, code: str, chunk_size=512):
+        """Encodes code in chunks to get multiple embeddings per file."""
+        return self.embed_input_ids(self.tokenize_code_chunks(code, chunk_size))
+
     def add_code_to_index(self, code: str, faiss_manager):
-        """Encodes the code and adds its embedding to the FAISS index."""
-        embedding = self.encode_code(code)
-        faiss_manager.add_embeddings(np.array([embedding]))  # Add to FAISS index
-        self.id_count += 1
-        return self.id_count
+        """Encodes the code, adds its embedding to the FAISS index and returns its id."""
+        embedding = self.encode_code(code, use_cache=True)
+        return int(faiss_manager.add_embeddings(np.array([embedding]), index_name=CODE_INDEX)[0])  # Add to FAISS index
     
     def add_code_to_index_by_chunks(self, code: str, faiss_manager):
         """Encodes the code and adds its embedding to the FAISS index."""
         embeddings = self.encode_code_by_chunks(code)
-        embedding_ids = []
-        for embedding in embeddings:
-            faiss_manager.add_embeddings(np.array([embedding]))  # Add to FAISS index
-            print("Debugging", self.id_count)
-            self.id_count += 1
-            embedding_ids.append(self.id_count)
-        print("id_count: ", self.id_count)
-        return embedding_ids, self.id_count
+        return self.add_chunk_embeddings_to_index(embeddings, faiss_manager)
+
+    def add_chunk_embeddings_to_index(self, embeddings, faiss_manager):
+        """Adds already computed chunk embeddings of one file to the FAISS index and returns their ids."""
+        if not embeddings:
+            return []
+        return [int(i) for i in faiss_manager.add_embeddings(np.vstack(embeddings), index_name=CODE_INDEX)]  # Add to FAISS index
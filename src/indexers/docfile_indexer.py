@@ -2,27 +2,86 @@ import torch
 from transformers import AutoModel, AutoTokenizer
 import numpy as np
 
+from src.utils.config_loader import load_config
+from src.utils.embedding_cache import get_embedding_cache
+from src.utils.embedding_utils import DOC_INDEX
+from .encoding_utils import mean_pool, token_budget_batches
+
+# Load configuration once when module is imported
+_config = load_config().get("embedding", {})
+
 class DocumentIndexer:
-    def __init__(self, model_name="sentence-transformers/all-mpnet-base-v2", embedding_dim=768):
+    def __init__(self, model_name="sentence-transformers/all-mpnet-base-v2", embedding_dim=768, batch_size=None, max_batch_tokens=None):
         # Initialize model and tokenizer
         self.tokenizer = AutoTokenizer.from_pretrained(model_name)
         self.model = AutoModel.from_pretrained(model_name)
+        self.model_name = model_name
         self.embedding_dim = embedding_dim
-        self.id_count = -1  # Store document IDs corresponding to FAISS index entries
-
-    def set_index_value(self, updated_id_count: int):
-        self.id_count = updated_id_count
+        self.batch_size = batch_size or _config.get("batch_size", 16)
+        self.max_batch_tokens = max_batch_tokens or _config.get("max_batch_tokens", 8192)
+        self.cache = get_embedding_cache()
 
-    def encode_document(self, document: str):
+    def encode_document(self, document: str, use_cache=False):
         """Encodes document text to produce a vector representation."""
-        inputs = self.tokenizer(document, return_tensors="pt", truncation=True, padding=True, max_length=512)
+        return self.encode_documents([document], use_cache)[0]
+
+    def encode_documents(self, documents, use_cache=False):
+        """
+        Encodes several texts in batched forward passes; returns an (n, d) matrix.
+        Queries bypass the embedding cache unless use_cache is set, so query text is
+        never written to the on-disk ingestion cache.
+        """
+        if not documents:
+            return np.empty((0, self.embedding_dim), dtype=np.float32)
+        input_ids = self.tokenizer(list(documents), truncation=True, max_length=512)["input_ids"]
+        return np.vstack(self.embed_input_ids(input_ids, use_cache))
+
+    def warm_up(self):
+        """Runs one uncached forward pass so lazy initialisation is paid before the first query."""
+        inputs = self.tokenizer(["warm up"], return_tensors="pt")
         with torch.no_grad():
-            outputs = self.model(**inputs)
-        return outputs.last_hidden_state.mean(dim=1).cpu().numpy().flatten()
+            self.model(**inputs)
+
+    def tokenize_document(self, document: str):
+        """Returns the model input ids of a document, truncated like encode_document."""
+        return self.tokenizer(document, truncation=True, max_length=512)["input_ids"]
+
+    def embed_input_ids(self, input_ids, use_cache=True, on_batch=None):
+        """
+        Runs the model over token id sequences in padded batches of at most batch_size
+        sequences and max_batch_tokens padded tokens, returning one embedding per sequence.
+        With use_cache, sequences found in the embedding cache are not recomputed.
+        on_batch(lengths), if given, is called with the sequence lengths of every batch run.
+        """
+        cache = self.cache if use_cache else None
+        if cache:
+            embeddings = cache.get_many(self.model_name, input_ids)
+        else:
+            embeddings = [None] * len(input_ids)
+        missing = [position for position, embedding in enumerate(embeddings) if embedding is None]
+        lengths = [len(input_ids[position]) for position in missing]
+
+        for batch in token_budget_batches(lengths, self.batch_size, self.max_batch_tokens):
+            positions = [missing[i] for i in batch]
+            if on_batch:
+                on_batch([lengths[i] for i in batch])
+            inputs = self.tokenizer.pad({"input_ids": [input_ids[position] for position in positions]}, return_tensors="pt")
+            with torch.no_grad():
+                outputs = self.model(**inputs)
+            pooled = mean_pool(outputs.last_hidden_state, inputs["attention_mask"]).cpu().numpy()
+            for position, embedding in zip(positions, pooled):
+                embeddings[position] = embedding
+
+        if cache and missing:
+            cache.put_many(self.model_name, [input_ids[position] for position in missing],
+                                [embeddings[position] for position in missing])
+        return embeddings
 
     def add_document_to_index(self, document: str, faiss_manager):
         """Encodes the document and adds its embedding to the FAISS index."""
-        embedding = self.encode_document(document)
-        faiss_manager.add_embeddings(np.array([embedding]))  # Add to FAISS index
-        self.id_count += 1
-        return self.id_count 
\ No newline at end of file
+        embedding = self.encode_document(document, use_cache=True)
+        return self.add_embedding_to_index(embedding, faiss_manager)
+
+    def add_embedding_to_index(self, embedding, faiss_manager):
+        """Adds an already computed document embedding to the FAISS index and returns its id."""
+        return int(faiss_manager.add_embeddings(np.array([embedding]), index_name=DOC_INDEX)[0])  # Add to FAISS index 
\ No newline at end of file
@@ -0,0 +1,105 @@
+import time
+
+from src.ingestion.data_models import CodeFile, DocumentationFile
+from src.utils.config_loader import load_config
+from src.utils.logging_utils import setup_logger, log_info
+
+logger = setup_logger()
+
+# Load configuration once when module is imported
+_config = load_config().get("embedding", {})
+
+class EmbeddingScheduler:
+    """
+    Sits between parsing and the indexers. Chunks from many files are accumulated,
+    sorted by token length so each batch holds sequences of similar size, embedded
+    in full batches, and routed back to their owning CodeFile/DocumentationFile.
+
+    on_embedded(parsed_file, embeddings) is called once per submitted file, in
+    submission order, with one embedding per chunk of that file.
+    """
+    def __init__(self, code_indexer, doc_indexer, on_embedded, max_pending_chunks=None):
+        self.code_indexer = code_indexer
+        self.doc_indexer = doc_indexer
+        self.on_embedded = on_embedded
+        self.max_pending_chunks = max_pending_chunks or _config.get("scheduler_max_pending_chunks", 1024)
+
+        self._pending = []  # (parsed_file, indexer, [input_ids, ...])
+        self._pending_chunks = 0
+
+        self.chunks_embedded = 0
+        self.real_tokens = 0
+        self.padded_tokens = 0
+        self.embed_seconds = 0.0
+
+    def submit(self, parsed_file):
+        """Queues a parsed file for embedding, flushing once enough chunks are pending."""
+        if isinstance(parsed_file, CodeFile):
+            indexer = self.code_indexer
+            chunks = self.code_indexer.tokenize_code_chunks(parsed_file.raw_code)
+        elif isinstance(parsed_file, DocumentationFile):
+            indexer = self.doc_indexer
+            chunks = [self.doc_indexer.tokenize_document(parsed_file.raw_content)]
+        else:
+            raise ValueError(f"Unsupported file type for embedding: {type(parsed_file).__name__}")
+
+        self._pending.append((parsed_file, indexer, chunks))
+        self._pending_chunks += len(chunks)
+        if self._pending_chunks >= self.max_pending_chunks:
+            self.flush()
+
+    def flush(self):
+        """Embeds every pending chunk and hands the files back through on_embedded."""
+        if not self._pending:
+            return
+
+        pending, self._pending = self._pending, []
+        self._pending_chunks = 0
+        results = [[None] * len(chunks) for _, _, chunks in pending]
+
+        start_time = time.perf_counter()
+        for indexer in (self.code_indexer, self.doc_indexer):
+            items = [
+                (owner, position, input_ids)
+                for owner, (_, owner_indexer, chunks) in enumerate(pending) if owner_indexer is indexer
+                for position, input_ids in enumerate(chunks)
+            ]
+            if not items:
+                continue
+
+            # Length-sorted input keeps padding per batch to a minimum
+            items.sort(key=lambda item: len(item[2]))
+            input_ids = [ids for _, _, ids in items]
+            # Stats come from the batches actually run, so cache hits are not counted
+            embeddings = indexer.embed_input_ids(input_ids, on_batch=self._record_batch)
+
+            for (owner, position, _), embedding in zip(items, embeddings):
+                results[owner][position] = embedding
+        self.embed_seconds += time.perf_counter() - start_time
+
+        for (parsed_file, _, _), embeddings in zip(pending, results):
+            self.on_embedded(parsed_file, embeddings)
+
+    def _record_batch(self, lengths):
+        self.padded_tokens += len(lengths) * max(lengths)
+        self.real_tokens += sum(lengths)
+        self.chunks_embedded += len(lengths)
+
+    def stats(self):
+        """
+        Returns counters for tuning: padding_efficiency is the share of padded
+        positions that carried real tokens.
+        """
+        return {
+            "chunks_embedded": self.chunks_embedded,
+            "real_tokens": self.real_tokens,
+            "padded_tokens": self.padded_tokens,
+            "padding_efficiency": self.real_tokens / self.padded_tokens if self.padded_tokens else 1.0,
+            "chunks_per_second": self.chunks_embedded / self.embed_seconds if self.embed_seconds else 0.0,
+        }
+
+    def log_stats(self):
+        stats = self.stats()
+        log_info(logger, f"Embedding scheduler: {stats['chunks_embedded']} chunks, "
+                    f"padding efficiency {stats['padding_efficiency']:.1%}, "
+                    f"{stats['chunks_per_second']:.1f} chunks/s.")
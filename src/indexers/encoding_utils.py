@@ -0,0 +1,31 @@
+def mean_pool(last_hidden_state, attention_mask):
+    """Averages token embeddings over the sequence, ignoring padding positions."""
+    mask = attention_mask.unsqueeze(-1).to(last_hidden_state.dtype)
+    return (last_hidden_state * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+
+def token_budget_batches(lengths, batch_size, max_batch_tokens):
+    """
+    Groups sequence positions into batches of at most batch_size sequences whose
+    padded size (len(batch) * longest sequence) stays within max_batch_tokens.
+    A single sequence longer than the budget still gets a batch of its own.
+
+    Args:
+        lengths (list): Token length of every sequence, in processing order.
+        batch_size (int): Maximum number of sequences per batch.
+        max_batch_tokens (int): Maximum padded token count per batch.
+
+    Returns:
+        list: Lists of positions into lengths, one list per batch.
+    """
+    batches = []
+    batch, longest = [], 0
+    for position, length in enumerate(lengths):
+        padded_longest = max(longest, length)
+        if batch and (len(batch) >= batch_size or (len(batch) + 1) * padded_longest > max_batch_tokens):
+            batches.append(batch)
+            batch, padded_longest = [], length
+        batch.append(position)
+        longest = padded_longest
+    if batch:
+        batches.append(batch)
+    return batches
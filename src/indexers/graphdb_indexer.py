@@ -1,8 +1,10 @@
-from src.utils.graphdb_utils import _get_graph, save_graph
+from src.utils.graphdb_utils import _get_graph, record_graph_changes
 from src.utils.logging_utils import log_info, setup_logger
 
 logger = setup_logger()
 
+_ENTITY_ATTRIBUTES = ("type", "file_path", "line_number", "end_line_number", "signature", "docstring", "decorators", "parents")
+
 def add_caller_callee_relations(code_file):
     """
     Takes a single CodeFile object and updates the graph with caller-callee relationships.
@@ -10,34 +12,79 @@ def add_caller_callee_relations(code_file):
     graph = _get_graph()
 
     for entity in code_file.entities:
-        if not graph.has_node(entity.name):
-            graph.add_node(entity.name,
-                           type=entity.type,
-                           file_path=entity.file_path,
-                           line_number=entity.line_number,
-                           docstring=entity.docstring,
-                           decorators=entity.decorators,
-                           parents=entity.parents)
-    
+        # add_node merges attributes, so a node first seen as a bare callee gets its definition
+        graph.add_node(entity.name,
+                       type=entity.type,
+                       file_path=entity.file_path,
+                       line_number=entity.line_number,
+                       end_line_number=entity.end_line_number,
+                       signature=entity.signature,
+                       docstring=entity.docstring,
+                       decorators=entity.decorators,
+                       parents=entity.parents)
+
     for function_call in code_file.function_calls:
         caller = function_call.caller
         callee = function_call.callee
 
-        # Ensure both caller and callee exist in the graph
-        if not graph.has_node(caller):
-            graph.add_node(caller, file_path=function_call.file_path)
-        graph.nodes[caller]["file_path"] = function_call.file_path
-        if not graph.has_node(callee):
-            graph.add_node(callee, file_path=function_call.file_path)
-        graph.nodes[callee]["file_path"] = function_call.file_path
-        
-        # Add dependency (caller → callee)
-        if graph.has_edge(caller, callee):
-            graph[caller][callee].setdefault("line_numbers", []).append(function_call.line_number)
-        else:
-            graph.add_edge(caller, callee, line_numbers=[function_call.line_number])
+        # Ensure both caller and callee exist in the graph; defined entities keep their own file_path
+        for name in (caller, callee):
+            if not graph.has_node(name):
+                graph.add_node(name, file_path=function_call.file_path)
+            elif "type" not in graph.nodes[name]:
+                graph.nodes[name]["file_path"] = function_call.file_path
+
+        # Add dependency (caller → callee); "files" records which files' calls the edge stands for
+        if not graph.has_edge(caller, callee):
+            graph.add_edge(caller, callee, line_numbers=[], files={})
+        edge = graph[caller][callee]
+        edge.setdefault("line_numbers", []).append(function_call.line_number)
+        edge.setdefault("files", {}).setdefault(function_call.file_path, []).append(function_call.line_number)
 
 
-    save_graph(graph)
+    record_graph_changes(graph)
     log_info(logger, f"Updated GraphDB with caller-callee relationships from {code_file.file_path}.")
 
+def _edge_owned_by(graph, caller, data, file_path):
+    # Edges written before ownership was recorded belong to the file that defines their caller
+    if "files" in data:
+        return file_path in data["files"]
+    return graph.nodes[caller].get("file_path") == file_path
+
+def remove_file_relations(file_path):
+    """
+    Removes what a file contributed to the graph: the calls made from it and the
+    definitions of its entities. An edge also recorded by other files keeps their
+    calls, and a node is only deleted once no edge or definition refers to it,
+    so nodes shared by name with unchanged files keep their relations.
+    """
+    graph = _get_graph()
+    touched = set()
+    removed_edges = 0
+
+    for caller, callee, data in list(graph.edges(data=True)):
+        if not _edge_owned_by(graph, caller, data, file_path):
+            continue
+        touched.update((caller, callee))
+        files = data.get("files", {})
+        files.pop(file_path, None)
+        if files:
+            data["line_numbers"] = [line for lines in files.values() for line in lines]
+        else:
+            graph.remove_edge(caller, callee)
+            removed_edges += 1
+
+    definitions = [node for node, data in graph.nodes(data=True) if data.get("type") and data.get("file_path") == file_path]
+    for node in definitions:
+        for attribute in _ENTITY_ATTRIBUTES:
+            graph.nodes[node].pop(attribute, None)
+    touched.update(definitions)
+
+    # Garbage-collect nodes left without a definition or any relation
+    orphans = [node for node in touched
+               if graph.has_node(node) and "type" not in graph.nodes[node] and graph.degree(node) == 0]
+    graph.remove_nodes_from(orphans)
+
+    record_graph_changes(graph)
+    log_info(logger, f"Removed {removed_edges} GraphDB edges, {len(definitions)} definitions and "
+                f"{len(orphans)} orphaned nodes contributed by {file_path}.")
@@ -32,13 +32,20 @@ def parse_code_file(file_path):
                 ]
                 decorators = [d for d in decorators if d is not None]  # Remove None values
                 
+                signature = f"def {node.name}({ast.unparse(node.args)})"
+                if node.returns:
+                    signature += f" -> {ast.unparse(node.returns)}"
+
                 entities.append(CodeEntity(
                     name=node.name,
                     type="function",
                     file_path=file_path,
                     line_number=node.lineno,
                     docstring=docstring,
-                    decorators=decorators
+                    decorators=decorators,
+                    end_line_number=node.end_lineno,
+                    start_line_number=min([d.lineno for d in node.decorator_list], default=node.lineno),
+                    signature=signature
                 ))
 
                 # Extract function calls within this function
@@ -76,7 +83,10 @@ def parse_code_file(file_path):
                     file_path=file_path,
                     line_number=node.lineno,
                     docstring=docstring,
-                    parents=bases  # Add parent classes
+                    parents=bases,  # Add parent classes
+                    end_line_number=node.end_lineno,
+                    start_line_number=min([d.lineno for d in node.decorator_list], default=node.lineno),
+                    signature=f"class {node.name}({', '.join(ast.unparse(base) for base in node.bases)})" if node.bases else f"class {node.name}"
                 ))
 
             # Extract imports
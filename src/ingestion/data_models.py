@@ -31,6 +31,9 @@ class CodeEntity:
         docstring (Optional[str]): Docstring associated with the entity (if available).
         decorators (List[str]): List of decorators applied to the entity.
         parents (List[str]): Parent classes for class definitions (empty for functions).
+        end_line_number (Optional[int]): Last line of the entity's source span.
+        start_line_number (Optional[int]): First line of the entity's source span, its first decorator if any.
+        signature (Optional[str]): Definition line, e.g. "def name(args) -> returns".
     """
     name: str
     type: str  # "function" or "class"
@@ -39,6 +42,9 @@ class CodeEntity:
     docstring: Optional[str] = None
     decorators: List[str] = field(default_factory=list)
     parents: List[str] = field(default_factory=list)
+    end_line_number: Optional[int] = None
+    start_line_number: Optional[int] = None
+    signature: Optional[str] = None
 
 
 @dataclass
@@ -141,6 +147,10 @@ class IngestedData:
         code_files (List[CodeFile]): List of parsed source code files.
         documentation_files (List[DocumentationFile]): List of parsed documentation files.
         total_files (int): Total number of files processed during ingestion.
+        skipped_files (List[str]): Files left untouched because their content did not change.
+        deleted_files (List[str]): Files whose stale index data was removed.
     """
     code_files: List[CodeFile] = field(default_factory=list)
-    documentation_files: List[DocumentationFile] = field(default_factory=list)
\ No newline at end of file
+    documentation_files: List[DocumentationFile] = field(default_factory=list)
+    skipped_files: List[str] = field(default_factory=list)
+    deleted_files: List[str] = field(default_factory=list)
\ No newline at end of file
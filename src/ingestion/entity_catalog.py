@@ -0,0 +1,118 @@
+import json
+import os
+
+from src.utils.config_loader import load_config
+from src.utils.logging_utils import setup_logger, log_info
+
+logger = setup_logger()
+
+# Load configuration once when module is imported
+_config = load_config().get("ingestion", {})
+
+# Entity types listed in the catalog
+ENTITY_TYPES = ("function", "class")
+
+_entity_catalog = None
+
+def get_entity_catalog():
+    """Returns the shared entity catalog, loaded from ingestion.catalog_path."""
+    global _entity_catalog
+    if _entity_catalog is None:
+        _entity_catalog = EntityCatalog(_config.get("catalog_path", "./data/catalog/entity_catalog.json"))
+    return _entity_catalog
+
+class EntityCatalog:
+    """
+    Names, types and defining files of every function and class in the repository,
+    built at ingestion time so the query path never has to scan Mongo for them.
+    Persisted as compact JSON:
+    {file_path: {"entities": [[name, type], ...], "embedding_ids": [...]}}.
+    """
+    def __init__(self, catalog_path):
+        self.catalog_path = catalog_path
+        self.entries = {}
+        self._mtime = None
+        self._files_by_embedding_id = None
+        self.reload_if_changed()
+
+    def _current_mtime(self):
+        try:
+            return os.stat(self.catalog_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def reload_if_changed(self):
+        """Re-reads the catalog if ingestion rewrote it since it was loaded. Returns True on reload."""
+        mtime = self._current_mtime()
+        if mtime == self._mtime:
+            return False
+
+        if mtime is None:
+            log_info(logger, f"No entity catalog found at {self.catalog_path}; starting empty.")
+            self.entries = {}
+        else:
+            with open(self.catalog_path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+            log_info(logger, f"Entity catalog loaded from {self.catalog_path} ({len(self.entries)} files)")
+        self._mtime = mtime
+        self._invalidate()
+        return True
+
+    def _invalidate(self):
+        self._files_by_embedding_id = None
+
+    def save(self):
+        """Writes the catalog atomically (temp file + rename)."""
+        os.makedirs(os.path.dirname(self.catalog_path), exist_ok=True)
+        tmp_path = f"{self.catalog_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, separators=(",", ":"))
+        os.replace(tmp_path, self.catalog_path)
+        self._mtime = self._current_mtime()
+        log_info(logger, f"Entity catalog saved to {self.catalog_path} ({len(self.entries)} files)")
+
+    def update_file(self, code_file):
+        """Replaces the catalog entries of a parsed and embedded CodeFile."""
+        self.entries[code_file.file_path] = {
+            "entities": [
+                [entity.name, entity.type] for entity in code_file.entities
+                if entity.type in ENTITY_TYPES and entity.name
+            ],
+            "embedding_ids": [int(i) for i in code_file.embedding_ids or []],
+        }
+        self._invalidate()
+
+    def remove_file(self, file_path):
+        if self.entries.pop(file_path, None) is not None:
+            self._invalidate()
+
+    def clear(self):
+        self.entries = {}
+        self._invalidate()
+
+    def entities(self):
+        """Yields (name, type, file_path) for every catalogued entity."""
+        for file_path, entry in self.entries.items():
+            for name, entity_type in entry["entities"]:
+                yield name, entity_type, file_path
+
+    def entities_for_embedding_ids(self, embedding_ids):
+        """
+        Returns (name, type) of the entities defined in the files owning the given
+        code embedding ids, file by file in the order of the ids.
+        """
+        if self._files_by_embedding_id is None:
+            self._files_by_embedding_id = {
+                embedding_id: file_path
+                for file_path, entry in self.entries.items() for embedding_id in entry["embedding_ids"]
+            }
+
+        entities = []
+        seen_files = set()
+        for embedding_id in embedding_ids:
+            file_path = self._files_by_embedding_id.get(int(embedding_id))
+            if file_path is None or file_path in seen_files:
+                continue
+            seen_files.add(file_path)
+            entities.extend((name, entity_type) for name, entity_type in self.entries[file_path]["entities"])
+        return entities
@@ -1,70 +1,250 @@
 import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
 from .file_crawler import crawl_files
 from .code_parser import parse_code_file
 from .doc_parser import parse_doc_file
 from .data_models import CodeFile, IngestedData, DocumentationFile
+from .manifest import IngestionManifest
+from .entity_catalog import get_entity_catalog
 
+from src.utils.config_loader import load_config
 from src.utils.logging_utils import setup_logger, log_info, log_warning
-from src.utils.mongodb_utils import insert_code_file, insert_document_file
-from src.utils.embedding_utils import FAISSManager
+from src.utils.mongodb_utils import insert_code_file, insert_document_file, delete_metadata, BulkWriter
+from src.utils.embedding_utils import FAISSManager, CODE_INDEX, DOC_INDEX
+from src.utils.embedding_cache import get_embedding_cache
+from src.utils.graphdb_utils import flush_graph
 
 from src.indexers.index_manager import IndexManager
-from src.indexers.graphdb_indexer import add_caller_callee_relations
+from src.indexers.embedding_scheduler import EmbeddingScheduler
+from src.indexers.graphdb_indexer import add_caller_callee_relations, remove_file_relations
 
 logger = setup_logger()
 
+# Load configuration once when module is imported
+_config = load_config().get("ingestion", {})
+_embedding_config = load_config().get("embedding", {})
+_mongodb_config = load_config().get("mongodb", {})
+
+def _parse_file(parser, file):
+    """
+    Runs a parser on a single file. Kept at module level so it can be pickled
+    and shipped to worker processes.
+    """
+    try:
+        return parser(file)
+    except Exception as e:
+        log_warning(logger, f"Failed to parse {file}: {e}")
+        return None
+
+def _parse_chunk(jobs):
+    """Parses a list of (file, parser) jobs in one worker round trip."""
+    return [_parse_file(parser, file) for file, parser in jobs]
+
 class IngestionManager:
-    def __init__(self, root_dir):
+    def __init__(self, root_dir, parse_workers=None, incremental=None, use_scheduler=None):
         self.root_dir = root_dir
         self.parsers = {
             ".py": parse_code_file,
             ".md": parse_doc_file
         }
-        
+        self.parse_workers = parse_workers or _config.get("parse_workers", 1)
+        self.incremental = _config.get("incremental", False) if incremental is None else incremental
+        self.manifest = IngestionManifest(_config["manifest_path"]) if self.incremental else None
+        self.catalog = get_entity_catalog()
+        self.use_scheduler = _embedding_config.get("scheduler", False) if use_scheduler is None else use_scheduler
+
         index_manager = IndexManager()
         self.code_indexer = index_manager.get_code_indexer()
-        self.doc_indexer = index_manager.get_doc_indexer() 
-        
+        self.doc_indexer = index_manager.get_doc_indexer()
+
         self.faiss_manager = FAISSManager()
+        if not self.incremental:
+            self._reset_stores()
+        self.mongo_writer = BulkWriter() if _mongodb_config.get("bulk_writes", False) else None
+        # file_path -> (embedding ids, index name) of files stored during this run
+        self._stored_files = {}
+
+    def _reset_stores(self):
+        """
+        A full run rebuilds everything, so it starts from empty indices with ids from 0.
+        File documents and the manifest of earlier runs would otherwise point at reused
+        ids, and their old vectors would keep ranking as orphans.
+        """
+        self.faiss_manager.reset()
+        delete_metadata({"type": {"$in": ["CodeFile.class", "DocumentationFile.class"]}}, multiple=True)
+        self.catalog.clear()
+        if os.path.exists(_config["manifest_path"]):
+            os.remove(_config["manifest_path"])
+
+    def _discard_indexed_data(self, file_path, embedding_ids, index_name):
+        """Deletes the FAISS vectors, graph relations and catalog entry of a file."""
+        self.faiss_manager.remove_embeddings(embedding_ids, index_name=index_name)
+        remove_file_relations(file_path)
+        self.catalog.remove_file(file_path)
+
+    def _remove_file(self, file_path):
+        """
+        Deletes the Mongo documents, FAISS vectors and graph nodes that belong to a file.
+        """
+        delete_metadata({"type": {"$in": ["CodeFile.class", "DocumentationFile.class"]}, "file_path": file_path}, multiple=True)
+        self._discard_indexed_data(file_path, self.manifest.get_embedding_ids(file_path), self.manifest.get_index_name(file_path))
+        self.manifest.remove(file_path)
+
+    def _commit(self):
+        """
+        Writes buffered index state to disk. The manifest goes last so it never
+        references data that did not reach disk.
+        """
+        if self.mongo_writer:
+            self.mongo_writer.flush()
+            # Files whose documents were not written are dropped from every index and
+            # the manifest, so the next run re-adds them without orphaning vectors
+            for file_path in self.mongo_writer.failed_file_paths:
+                if file_path in self._stored_files:
+                    self._discard_indexed_data(file_path, *self._stored_files.pop(file_path))
+                if self.incremental:
+                    self.manifest.remove(file_path)
+        self.faiss_manager.flush()
+        flush_graph()
+        self.catalog.save()
+        if self.incremental:
+            self.manifest.save()
+
+    def _write_document(self, document):
+        if self.mongo_writer:
+            self.mongo_writer.add(document)
+        elif document["type"] == "CodeFile.class":
+            insert_code_file(document)
+        else:
+            insert_document_file(document)
+
+    def _store(self, parsed_data, embeddings, ingested_data):
+        """
+        Adds a parsed file's embeddings to FAISS and persists the file to Mongo,
+        the graph and the manifest.
+        """
+        try:
+            if isinstance(parsed_data, CodeFile):
+                code_file = parsed_data
+                embedding_ids = self.code_indexer.add_chunk_embeddings_to_index(embeddings, self.faiss_manager)
+                index_name = CODE_INDEX
+                code_file.embedding_ids = embedding_ids
+                self._write_document(code_file.to_dict())
+                add_caller_callee_relations(code_file)
+                self.catalog.update_file(code_file)
+                ingested_data.code_files.append(code_file)
+            else:
+                doc_file = parsed_data
+                embedding_id = self.doc_indexer.add_embedding_to_index(embeddings[0], self.faiss_manager)
+                doc_file.embedding_id = embedding_id
+                embedding_ids = [embedding_id]
+                index_name = DOC_INDEX
+                self._write_document(doc_file.to_dict())
+                ingested_data.documentation_files.append(doc_file)
+
+            self._stored_files[parsed_data.file_path] = (embedding_ids, index_name)
+            if self.incremental:
+                self.manifest.record(parsed_data.file_path, embedding_ids, index_name)
+        except Exception as e:
+            log_warning(logger, f"Failed to index {parsed_data.file_path}: {e}")
+
+    def _parse_files(self, files):
+        """
+        Parses files and yields (file, parsed_data) pairs in crawl order.
+        With more than one worker, parsing is fanned out to a process pool while
+        the caller consumes results for embedding and storage.
+        """
+        jobs = []
+        for file in files:
+            _, extension = os.path.splitext(file)
+            parser = self.parsers.get(extension)
+            if parser:
+                jobs.append((file, parser))
+            else:
+                log_warning(logger, f"No parser registered for file type: {file}")
+
+        if not jobs:
+            return
+
+        if self.parse_workers <= 1:
+            for file, parser in jobs:
+                yield file, _parse_file(parser, file)
+            return
+
+        log_info(logger, f"Parsing {len(jobs)} files with {self.parse_workers} worker processes.")
+        chunksize = max(1, len(jobs) // (self.parse_workers * 8))
+        chunks = [jobs[i:i + chunksize] for i in range(0, len(jobs), chunksize)]
+        # At most 2 * parse_workers chunks (2 * parse_workers * chunksize files) are in flight,
+        # so parsed files never pile up in memory when embedding is slower than parsing
+        max_outstanding = 2 * self.parse_workers
+        with ProcessPoolExecutor(max_workers=self.parse_workers) as executor:
+            outstanding = deque()
+            for chunk in chunks:
+                outstanding.append((chunk, executor.submit(_parse_chunk, chunk)))
+                if len(outstanding) >= max_outstanding:
+                    done_chunk, future = outstanding.popleft()
+                    yield from zip([file for file, _ in done_chunk], future.result())
+            while outstanding:
+                done_chunk, future = outstanding.popleft()
+                yield from zip([file for file, _ in done_chunk], future.result())
 
     def ingest(self):
         """
-        Orchestrates the ingestion process by crawling files, parsing them, 
+        Orchestrates the ingestion process by crawling files, parsing them,
         and returning structured data models.
         """
         log_info(logger, f"File root: {self.root_dir}")
         files = crawl_files(self.root_dir)
         ingested_data = IngestedData()
+        start_time = time.perf_counter()
 
-        for file in files:
-            try:
-                # Determine parser based on file extension
-                _, extension = os.path.splitext(file)
-                parser = self.parsers.get(extension)
-
-                if parser:
-                    parsed_data = parser(file)
-                    if isinstance(parsed_data, CodeFile):
-                        code_file = parsed_data
-                        embedding_ids, id_count = self.code_indexer.add_code_to_index_by_chunks(code_file.raw_code, self.faiss_manager)
-                        self.doc_indexer.set_index_value(id_count)
-                        code_file.embedding_ids = embedding_ids
-                        insert_code_file(code_file.to_dict())
-                        add_caller_callee_relations(code_file)
-                        ingested_data.code_files.append(code_file)
-                    elif isinstance(parsed_data, DocumentationFile):
-                        doc_file = parsed_data
-                        embedding_id = self.doc_indexer.add_document_to_index(doc_file.raw_content, self.faiss_manager)
-                        self.code_indexer.set_index_value(embedding_id)
-                        doc_file.embedding_id = embedding_id
-                        insert_document_file(doc_file.to_dict())
-                        ingested_data.documentation_files.append(doc_file)
-                else:
-                    log_warning(logger, f"No parser registered for file type: {file}")
-            except Exception as e:
-                log_warning(logger, f"Failed to parse {file}: {e}")
+        scheduler = None
+        if self.use_scheduler:
+            scheduler = EmbeddingScheduler(
+                self.code_indexer, self.doc_indexer,
+                on_embedded=lambda parsed_data, embeddings: self._store(parsed_data, embeddings, ingested_data)
+            )
+
+        try:
+            if self.incremental:
+                changes = self.manifest.diff(files, self.root_dir)
+                for file in changes.removed + changes.changed:
+                    self._remove_file(file)
+                ingested_data.skipped_files = changes.unchanged
+                ingested_data.deleted_files = changes.removed
+                files = changes.added + changes.changed
+                log_info(logger, f"Incremental ingestion: {len(changes.added)} added, {len(changes.changed)} updated, "
+                            f"{len(changes.removed)} deleted, {len(changes.unchanged)} skipped (unchanged).")
+
+            for file, parsed_data in self._parse_files(files):
+                try:
+                    if not isinstance(parsed_data, (CodeFile, DocumentationFile)):
+                        continue
+                    if scheduler:
+                        scheduler.submit(parsed_data)
+                    elif isinstance(parsed_data, CodeFile):
+                        self._store(parsed_data, self.code_indexer.encode_code_by_chunks(parsed_data.raw_code), ingested_data)
+                    else:
+                        self._store(parsed_data, [self.doc_indexer.encode_document(parsed_data.raw_content, use_cache=True)], ingested_data)
+                except Exception as e:
+                    log_warning(logger, f"Failed to index {file}: {e}")
+
+            if scheduler:
+                scheduler.flush()
+                scheduler.log_stats()
+        finally:
+            self._commit()
+
+        if get_embedding_cache():
+            get_embedding_cache().log_stats()
 
+        elapsed = time.perf_counter() - start_time
+        total = len(ingested_data.code_files) + len(ingested_data.documentation_files)
         log_info(logger, f"Ingested {len(ingested_data.code_files)} code files and "
                     f"{len(ingested_data.documentation_files)} documentation files.")
-        return ingested_data
\ No newline at end of file
+        log_info(logger, f"Ingestion took {elapsed:.2f}s ({total / elapsed if elapsed > 0 else 0.0:.2f} files/s "
+                    f"with {self.parse_workers} parse worker(s)).")
+        return ingested_data
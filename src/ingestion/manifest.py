@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from typing import List
+
+from src.utils.logging_utils import setup_logger, log_info
+
+logger = setup_logger()
+
+@dataclass
+class ManifestDiff:
+    """
+    Result of comparing crawled files against the ingestion manifest.
+
+    Attributes:
+        added (List[str]): Files not seen in a previous run.
+        changed (List[str]): Files whose content hash differs from the manifest.
+        unchanged (List[str]): Files whose content is identical to the manifest.
+        removed (List[str]): Manifest entries under the root that no longer exist.
+    """
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+
+def hash_file(file_path):
+    """Returns the sha256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class IngestionManifest:
+    """
+    Persists path -> {sha256, mtime, size, index, embedding_ids} for every ingested file,
+    so re-ingestion only has to process files whose content actually changed.
+    """
+    def __init__(self, manifest_path):
+        self.manifest_path = manifest_path
+        self.entries = self._load()
+        self._fingerprints = {}
+
+    def _load(self):
+        if not os.path.exists(self.manifest_path):
+            log_info(logger, f"No ingestion manifest found at {self.manifest_path}; every file is treated as new.")
+            return {}
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self):
+        """Writes the manifest atomically (temp file + rename)."""
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.manifest_path)
+        log_info(logger, f"Ingestion manifest saved to {self.manifest_path} ({len(self.entries)} files)")
+
+    def diff(self, files, root_dir):
+        """
+        Classifies crawled files against the manifest. Files whose mtime and size
+        match the manifest are skipped without hashing; everything else is hashed.
+        """
+        result = ManifestDiff()
+        seen = set(files)
+
+        for file in files:
+            stat = os.stat(file)
+            entry = self.entries.get(file)
+
+            if entry is not None and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+                result.unchanged.append(file)
+                continue
+
+            content_hash = hash_file(file)
+            self._fingerprints[file] = (content_hash, stat.st_mtime, stat.st_size)
+
+            if entry is None:
+                result.added.append(file)
+            elif entry["sha256"] == content_hash:
+                # Touched but not modified: refresh the fast-path fields only
+                entry["mtime"], entry["size"] = stat.st_mtime, stat.st_size
+                result.unchanged.append(file)
+            else:
+                result.changed.append(file)
+
+        root_prefix = os.path.join(root_dir, "")
+        result.removed = [path for path in self.entries if path.startswith(root_prefix) and path not in seen]
+        return result
+
+    def get_embedding_ids(self, file_path):
+        entry = self.entries.get(file_path)
+        return list(entry.get("embedding_ids", [])) if entry else []
+
+    def get_index_name(self, file_path):
+        entry = self.entries.get(file_path)
+        return entry.get("index", "code") if entry else "code"
+
+    def record(self, file_path, embedding_ids, index_name):
+        """Marks a file as ingested with the FAISS index and embedding ids it produced."""
+        fingerprint = self._fingerprints.pop(file_path, None)
+        if fingerprint is None:
+            stat = os.stat(file_path)
+            fingerprint = (hash_file(file_path), stat.st_mtime, stat.st_size)
+
+        content_hash, mtime, size = fingerprint
+        self.entries[file_path] = {
+            "sha256": content_hash,
+            "mtime": mtime,
+            "size": size,
+            "index": index_name,
+            "embedding_ids": [int(i) for i in embedding_ids],
+        }
+
+    def remove(self, file_path):
+        self.entries.pop(file_path, None)
@@ -0,0 +1,182 @@
+import difflib
+import heapq
+import re
+from collections import deque
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+# Identifier-looking words in free text
+_WORD_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+# Pieces of an identifier: acronyms, capitalised/lowercase runs and digits
+_TOKEN_PATTERN = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+def split_identifier(name: str) -> List[str]:
+    """Splits snake_case, camelCase and PascalCase names into lowercase tokens."""
+    return [token.lower() for token in _TOKEN_PATTERN.findall(name)]
+
+def _is_identifier_like(query: str, start: int, end: int) -> bool:
+    """True when a query word is written as code: snake/camel case, digits, a call or backticks."""
+    word = query[start:end]
+    if "_" in word or any(c.isdigit() for c in word) or any(c.isupper() for c in word[1:]):
+        return True
+    return query[end:end + 1] == "(" or (query[start - 1:start] == "`" and query[end:end + 1] == "`")
+
+@dataclass
+class EntityMatch:
+    """
+    Entities found in a query by EntityMatcher.
+
+    Attributes:
+        exact (List[Tuple[str, str]]): (name, type) of entities written as a whole query word.
+        partial (List[Tuple[str, str]]): Entities matched across several words or inside a longer word,
+            or plain lowercase words that happen to equal an entity name.
+        fuzzy (List[Tuple[str, str]]): Closest entities for code-like words that matched nothing exactly.
+    """
+    exact: List[Tuple[str, str]] = field(default_factory=list)
+    partial: List[Tuple[str, str]] = field(default_factory=list)
+    fuzzy: List[Tuple[str, str]] = field(default_factory=list)
+
+    @property
+    def ambiguous(self) -> bool:
+        """Unambiguous only when something matched exactly and no word needed fuzzy matching."""
+        return not self.exact or bool(self.fuzzy)
+
+    def entities(self) -> List[Tuple[str, str]]:
+        """Best-effort resolution: exact matches if any, otherwise every candidate."""
+        return self.exact if self.exact else self.partial + self.fuzzy
+
+class EntityMatcher:
+    """
+    Finds known entity names in a query without calling the LLM. Names are split
+    into identifier tokens and compiled into a token-level Aho-Corasick automaton,
+    so every name is found in one pass over the query regardless of how many exist.
+    Code-like words without an exact match are fuzzy matched with difflib.
+    """
+    def __init__(self, entities, fuzzy_cutoff=0.85):
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self._patterns = []  # [(tokens, [(name, type), ...])]
+        self._goto = [{}]
+        self._fail = [0]
+        self._outputs = [[]]
+        self._compact_names = {}  # "".join(tokens) -> pattern id, for fuzzy matching
+        self._compact_by_length = {}
+        self._patterns_by_token = {}  # token -> pattern ids, for related()
+
+        pattern_ids = {}
+        for name, entity_type in entities:
+            tokens = tuple(split_identifier(name))
+            if not tokens:
+                continue
+            if tokens not in pattern_ids:
+                pattern_ids[tokens] = len(self._patterns)
+                self._patterns.append((tokens, []))
+                self._insert(tokens, pattern_ids[tokens])
+            if (name, entity_type) not in self._patterns[pattern_ids[tokens]][1]:
+                self._patterns[pattern_ids[tokens]][1].append((name, entity_type))
+
+        for pattern_id, (tokens, _) in enumerate(self._patterns):
+            compact = "".join(tokens)
+            self._compact_names[compact] = pattern_id
+            self._compact_by_length.setdefault(len(compact), []).append(compact)
+            for token in set(tokens):
+                self._patterns_by_token.setdefault(token, []).append(pattern_id)
+        self._build_failure_links()
+
+    def __len__(self):
+        return sum(len(names) for _, names in self._patterns)
+
+    def _insert(self, tokens, pattern_id):
+        state = 0
+        for token in tokens:
+            if token not in self._goto[state]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+                self._goto[state][token] = len(self._goto) - 1
+            state = self._goto[state][token]
+        self._outputs[state].append(pattern_id)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(token, 0)
+                self._outputs[next_state] = self._outputs[next_state] + self._outputs[self._fail[next_state]]
+
+    def _scan(self, tokens):
+        """Yields (start, end, pattern_id) for every pattern occurrence in the token list."""
+        state = 0
+        for position, token in enumerate(tokens):
+            while state and token not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(token, 0)
+            for pattern_id in self._outputs[state]:
+                yield position - len(self._patterns[pattern_id][0]) + 1, position + 1, pattern_id
+
+    def _fuzzy(self, word):
+        compact = "".join(split_identifier(word))
+        slack = max(2, len(compact) // 5)
+        candidates = [
+            name for length in range(len(compact) - slack, len(compact) + slack + 1)
+            for name in self._compact_by_length.get(length, [])
+        ]
+        return [self._compact_names[name] for name in difflib.get_close_matches(compact, candidates, n=3, cutoff=self.fuzzy_cutoff)]
+
+    def related(self, query: str, limit=50) -> List[Tuple[str, str]]:
+        """
+        Ranks entities by the identifier tokens they share with the query, rarer
+        tokens weighing more. Tokens shared by a tenth of all names carry no signal and are skipped.
+        """
+        common = max(100, len(self._patterns) // 10)
+        scores = {}
+        for token in set(split_identifier(query)):
+            pattern_ids = self._patterns_by_token.get(token, [])
+            if not pattern_ids or len(pattern_ids) > common:
+                continue
+            weight = 1.0 / len(pattern_ids)
+            for pattern_id in pattern_ids:
+                scores[pattern_id] = scores.get(pattern_id, 0.0) + weight
+        return [entity for pattern_id in heapq.nlargest(limit, scores, key=scores.get) for entity in self._patterns[pattern_id][1]]
+
+    def match(self, query: str) -> EntityMatch:
+        tokens, token_words, words = [], [], []
+        for match in _WORD_PATTERN.finditer(query):
+            word_tokens = split_identifier(match.group())
+            if not word_tokens:
+                continue
+            words.append((match.start(), match.end(), len(tokens), len(tokens) + len(word_tokens)))
+            token_words.extend([len(words) - 1] * len(word_tokens))
+            tokens.extend(word_tokens)
+
+        # Keep the longest occurrences; names contained in a longer matched name are dropped
+        hits = sorted(self._scan(tokens), key=lambda hit: (hit[0], -(hit[1] - hit[0])))
+        kept = [hit for hit in hits if not any(
+            other is not hit and other[0] <= hit[0] and hit[1] <= other[1] and other[1] - other[0] > hit[1] - hit[0]
+            for other in hits
+        )]
+
+        result = EntityMatch()
+        covered = set()
+        for start, end, pattern_id in kept:
+            word_start, word_end, first_token, last_token = words[token_words[start]]
+            whole_word = token_words[start] == token_words[end - 1] and (first_token, last_token) == (start, end)
+            exact = whole_word and (end - start > 1 or _is_identifier_like(query, word_start, word_end))
+            bucket = result.exact if exact else result.partial
+            for entity in self._patterns[pattern_id][1]:
+                if entity not in bucket:
+                    bucket.append(entity)
+            covered.update(token_words[start:end])
+
+        for index, (word_start, word_end, _, _) in enumerate(words):
+            if index in covered or not _is_identifier_like(query, word_start, word_end):
+                continue
+            for pattern_id in self._fuzzy(query[word_start:word_end]):
+                for entity in self._patterns[pattern_id][1]:
+                    if entity not in result.fuzzy:
+                        result.fuzzy.append(entity)
+        return result
@@ -1,8 +1,196 @@
+import random
+import threading
+import time
+
+import google.generativeai as genai
+import requests
+from google.api_core import exceptions as google_exceptions
+
+from src.utils.config_loader import load_config
+from src.utils.logging_utils import setup_logger, log_info, log_warning
+
+logger = setup_logger()
+
+# Load configuration once when module is imported
+_config = load_config().get("gemini_api", {})
+
+# Upstream errors worth retrying; anything else (bad request, auth) fails immediately.
+# The REST transport (gemini_api.endpoint) raises requests' own connection and timeout errors.
+_RETRYABLE_ERRORS = (
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.TooManyRequests,
+    google_exceptions.InternalServerError,
+    google_exceptions.BadGateway,
+    google_exceptions.GatewayTimeout,
+    ConnectionError,
+    TimeoutError,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+)
+
+class LLMUnavailableError(RuntimeError):
+    """Raised when the LLM cannot be reached in time: circuit open, saturated or retries exhausted."""
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failed calls and rejects calls
+    until reset_seconds have passed; then one trial call is let through
+    (half-open), whose outcome closes or re-opens the circuit.
+    """
+    def __init__(self, failure_threshold=5, reset_seconds=30):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_seconds:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                log_info(logger, "LLM circuit closed.")
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_inconclusive(self):
+        """Ends a call whose outcome says nothing about upstream health, keeping the failure count."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                log_warning(logger, f"LLM circuit open for {self.reset_seconds}s after {self._failures} consecutive failures.")
+                self._opened_at = time.monotonic()
+
 class GeminiClient:
-    def __init__(self, api_key):
-        self.api_key = api_key
-        
-    # Call API to parse entities and intent from query
-    def analyze_query(self, query_text):
-        pass
-    
+    """
+    Shared Gemini client for the query path. One GenerativeModel handle is reused
+    for every call; each call has a per-attempt timeout and an overall deadline,
+    transient upstream errors are retried with jittered exponential backoff, a
+    semaphore caps calls in flight, and a circuit breaker fails fast while the
+    upstream is degraded so callers can fall back to local heuristics.
+
+    Setting gemini_api.endpoint (e.g. "http://localhost:8089") points the client
+    at a local stub server over the REST transport.
+    """
+    def __init__(self, api_key, model_name=None, endpoint=None, timeout_seconds=None, deadline_seconds=None,
+                 max_retries=None, backoff_seconds=None, max_backoff_seconds=None, max_concurrent_calls=None):
+        endpoint = endpoint or _config.get("endpoint")
+        if endpoint:
+            genai.configure(api_key=api_key, transport="rest", client_options={"api_endpoint": endpoint})
+            log_info(logger, f"Gemini client using endpoint {endpoint}")
+        else:
+            genai.configure(api_key=api_key)
+
+        self.model_name = model_name or _config.get("model", "gemini-2.0-flash")
+        self.model = genai.GenerativeModel(self.model_name)
+        self.timeout_seconds = timeout_seconds or _config.get("timeout_seconds", 30)
+        self.deadline_seconds = deadline_seconds or _config.get("deadline_seconds", 60)
+        self.max_retries = max_retries if max_retries is not None else _config.get("max_retries", 3)
+        self.backoff_seconds = backoff_seconds or _config.get("backoff_seconds", 0.5)
+        self.max_backoff_seconds = max_backoff_seconds or _config.get("max_backoff_seconds", 8)
+        self._semaphore = threading.BoundedSemaphore(max_concurrent_calls or _config.get("max_concurrent_calls", 8))
+        self.breaker = CircuitBreaker(_config.get("breaker_failure_threshold", 5), _config.get("breaker_reset_seconds", 30))
+
+    def available(self):
+        """False while the circuit is open, so callers can skip straight to their fallback."""
+        return self.breaker.state != "open"
+
+    def _call(self, attempt_call, keep_slot=False):
+        """
+        Runs attempt_call(timeout) under the concurrency limit, retrying transient
+        errors until max_retries or the overall deadline is reached. With keep_slot
+        the call slot stays taken on success and the caller must release_slot().
+        """
+        if not self.available():
+            raise LLMUnavailableError("LLM circuit is open")
+
+        deadline = time.monotonic() + self.deadline_seconds
+        # Local saturation says nothing about the upstream, so it is not counted as a failure
+        if not self._semaphore.acquire(timeout=self.deadline_seconds):
+            raise LLMUnavailableError(f"No LLM call slot freed up within {self.deadline_seconds}s")
+        # Asked only once a slot is held, so a half-open trial call is never stranded waiting for one
+        if not self.breaker.allow():
+            self._semaphore.release()
+            raise LLMUnavailableError("LLM circuit is open")
+        succeeded = False
+        try:
+            attempt = 0
+            while True:
+                remaining = deadline - time.monotonic()
+                try:
+                    result = attempt_call(max(0.1, min(self.timeout_seconds, remaining)))
+                    self.breaker.record_success()
+                    succeeded = True
+                    return result
+                except _RETRYABLE_ERRORS as e:
+                    attempt += 1
+                    backoff = random.uniform(0, min(self.max_backoff_seconds, self.backoff_seconds * 2 ** attempt))
+                    if attempt > self.max_retries or time.monotonic() + backoff >= deadline:
+                        self.breaker.record_failure()
+                        raise LLMUnavailableError(f"LLM call failed after {attempt} attempt(s): {e}") from e
+                    log_warning(logger, f"LLM call attempt {attempt} failed ({e}); retrying in {backoff:.2f}s.")
+                    time.sleep(backoff)
+                except Exception:
+                    # Not retried, and not proof the upstream is healthy either: only free the trial slot
+                    self.breaker.record_inconclusive()
+                    raise
+        finally:
+            if not (keep_slot and succeeded):
+                self._semaphore.release()
+
+    def release_slot(self):
+        self._semaphore.release()
+
+    def generate(self, prompt):
+        """Returns the full response text for a prompt."""
+        def attempt(timeout):
+            response = self.model.generate_content(prompt, request_options={"timeout": timeout})
+            return response.text if response and response.parts else ""
+        return self._call(attempt)
+
+    def stream(self, prompt):
+        """
+        Yields response text chunks as they arrive. Opening the stream and
+        receiving the first chunk are retried; a failure after that ends the stream.
+        The call slot is held until the stream is exhausted or closed.
+        """
+        def attempt(timeout):
+            chunks = iter(self.model.generate_content(prompt, stream=True, request_options={"timeout": timeout}))
+            return chunks, next(chunks, None)
+
+        chunks, first = self._call(attempt, keep_slot=True)
+        try:
+            if first is None:
+                return
+            # chunk.text raises on chunks without parts (e.g. safety metadata only)
+            if first.parts:
+                yield first.text
+            for chunk in chunks:
+                if chunk.parts:
+                    yield chunk.text
+        finally:
+            self.release_slot()
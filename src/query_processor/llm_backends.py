@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+
+from src.utils.config_loader import load_config
+from src.utils.logging_utils import setup_logger, log_info
+from src.utils.token_utils import estimate_tokens
+
+logger = setup_logger()
+
+# Load configuration once when module is imported
+_config = load_config().get("llm", {})
+
+# Pieces of the extraction prompt built by get_extraction_from_gemini
+_EXTRACTION_MARKER = 'keys: "functions", "modules", and "classification"'
+_EXTRACTION_PATTERN = re.compile(r'Code Context:\n(?P<context>.*?)\n\nUser Query:\n"(?P<query>.*?)"\n', re.DOTALL)
+
+def prompt_key(prompt):
+    """Stable key of a prompt in the recordings file."""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+def load_recordings(path):
+    """Reads {prompt key: response} from a JSONL recordings file; later lines win."""
+    recordings = {}
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    recordings[record["key"]] = record["response"]
+    return recordings
+
+def create_llm_backend(api_key=None, backend=None):
+    """
+    Builds the LLM backend named by the LLM_BACKEND environment variable or llm.backend:
+    "gemini" calls the live API, "record" calls it and appends every response to
+    llm.recordings_path, and "stub" answers locally without a key or network.
+    """
+    backend = backend or os.environ.get("LLM_BACKEND") or _config.get("backend", "gemini")
+    if backend == "stub":
+        return TimedBackend(StubBackend(
+            recordings_path=_config.get("recordings_path"),
+            latency_seconds=_config.get("stub_latency_seconds", 0.5),
+            jitter_seconds=_config.get("stub_jitter_seconds", 0.1),
+            first_token_seconds=_config.get("stub_first_token_seconds", 0.2),
+        ))
+
+    if backend not in ("gemini", "record"):
+        raise ValueError(f"Unknown LLM backend '{backend}'. Use 'gemini', 'record' or 'stub'.")
+    if not api_key:
+        raise ValueError(f"Missing GEMINI_API_KEY environment variable (required by the '{backend}' LLM backend).")
+
+    # Imported here so the stub backend works without google-generativeai installed
+    from src.query_processor.gemini_client import GeminiClient
+    client = GeminiClient(api_key)
+    if backend == "record":
+        client = RecordingBackend(client, _config.get("recordings_path", "./data/llm_recordings/recordings.jsonl"))
+    return TimedBackend(client)
+
+class StubBackend:
+    """
+    Offline stand-in for GeminiClient. Prompts found in the recordings file are
+    answered with their recorded response; extraction prompts are otherwise answered
+    with schema-valid JSON naming the context entities that appear in the query, and
+    answer prompts with a placeholder. Every call sleeps for the configured latency
+    so the pipeline can be load-tested with realistic upstream timing.
+    """
+    def __init__(self, recordings_path=None, latency_seconds=0.5, jitter_seconds=0.1, first_token_seconds=0.2):
+        self.recordings = load_recordings(recordings_path)
+        self.latency_seconds = latency_seconds
+        self.jitter_seconds = jitter_seconds
+        self.first_token_seconds = first_token_seconds
+        log_info(logger, f"Stub LLM backend with {len(self.recordings)} recorded responses, "
+                    f"{latency_seconds:.2f}s injected latency.")
+
+    def available(self):
+        return True
+
+    def _latency(self):
+        return max(0.0, self.latency_seconds + random.uniform(-self.jitter_seconds, self.jitter_seconds))
+
+    def _respond(self, prompt):
+        recorded = self.recordings.get(prompt_key(prompt))
+        if recorded is not None:
+            return recorded
+        if _EXTRACTION_MARKER in prompt:
+            return json.dumps(self._synthesize_extraction(prompt))
+        return f"Stub answer for a ~{estimate_tokens(prompt)}-token prompt."
+
+    @staticmethod
+    def _synthesize_extraction(prompt):
+        match = _EXTRACTION_PATTERN.search(prompt)
+        if not match:
+            return {"functions": [], "modules": [], "classification": "documentation-related"}
+        try:
+            context = json.loads(match.group("context"))
+        except json.JSONDecodeError:
+            context = {}
+        query = match.group("query").lower()
+
+        def mentioned(names):
+            return [name for name in names if re.search(rf"\b{re.escape(name.lower())}\b", query)]
+
+        functions = mentioned(context.get("function", []))
+        modules = mentioned(context.get("class", []))
+        return {
+            "functions": functions,
+            "modules": modules,
+            "classification": "code-related" if functions or modules else "documentation-related",
+        }
+
+    def generate(self, prompt):
+        time.sleep(self._latency())
+        return self._respond(prompt)
+
+    def stream(self, prompt):
+        latency = self._latency()
+        first_token = min(self.first_token_seconds, latency)
+        words = self._respond(prompt).split(" ")
+        time.sleep(first_token)
+        for index, word in enumerate(words):
+            if index:
+                time.sleep((latency - first_token) / max(1, len(words) - 1))
+            yield word if index == len(words) - 1 else f"{word} "
+
+class RecordingBackend:
+    """Passes calls to a live backend and appends every prompt/response pair to a JSONL file for the stub."""
+    def __init__(self, backend, recordings_path):
+        self.backend = backend
+        self.recordings_path = recordings_path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(recordings_path), exist_ok=True)
+        log_info(logger, f"Recording LLM responses to {recordings_path}")
+
+    def available(self):
+        return self.backend.available()
+
+    def _record(self, prompt, response):
+        line = json.dumps({"key": prompt_key(prompt), "prompt_tokens": estimate_tokens(prompt), "response": response})
+        with self._lock, open(self.recordings_path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def generate(self, prompt):
+        response = self.backend.generate(prompt)
+        self._record(prompt, response)
+        return response
+
+    def stream(self, prompt):
+        chunks = []
+        for chunk in self.backend.stream(prompt):
+            chunks.append(chunk)
+            yield chunk
+        self._record(prompt, "".join(chunks))
+
+class TimedBackend:
+    """
+    Wraps a backend and accumulates the wall time spent inside LLM calls, so
+    benchmarks can separate upstream latency from the pipeline's own time.
+    """
+    def __init__(self, backend):
+        self.backend = backend
+        self.calls = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def available(self):
+        return self.backend.available()
+
+    def _add(self, seconds):
+        with self._lock:
+            self.calls += 1
+            self.seconds += seconds
+
+    def generate(self, prompt):
+        start_time = time.perf_counter()
+        try:
+            return self.backend.generate(prompt)
+        finally:
+            self._add(time.perf_counter() - start_time)
+
+    def stream(self, prompt):
+        # Time between chunks is spent in the LLM; time the consumer spends on a chunk is not
+        seconds = 0.0
+        chunks = iter(self.backend.stream(prompt))
+        try:
+            while True:
+                start_time = time.perf_counter()
+                try:
+                    chunk = next(chunks)
+                except StopIteration:
+                    seconds += time.perf_counter() - start_time
+                    return
+                seconds += time.perf_counter() - start_time
+                yield chunk
+        finally:
+            self._add(seconds)
+
+    def stats(self):
+        return {"calls": self.calls, "seconds": self.seconds}
@@ -3,30 +3,89 @@ import json
 import logging
 import re
 import sys
-import google.generativeai as genai
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+import numpy as np
 
 from src.indexers.index_manager import IndexManager
-from src.utils.graphdb_utils import get_dependencies, entity_exists
-from src.utils.embedding_utils import FAISSManager
-from src.retrievers.codefile_retriever import fetch_code_file_by_embedding_id, fetch_all_code_files
-from src.retrievers.docfile_retiever import fetch_document_by_embedding_id
+from src.utils.config_loader import load_config
+from src.utils.graphdb_utils import get_dependencies, entity_exists, get_typed_entities, reload_graph
+from src.utils.embedding_utils import FAISSManager, CODE_INDEX, DOC_INDEX
+from src.utils.mongodb_utils import verify_indexes
+from src.utils.token_utils import estimate_tokens
+from src.retrievers.codefile_retriever import fetch_code_files_by_embedding_ids
+from src.ingestion.entity_catalog import get_entity_catalog
+from src.query_processor.entity_matcher import EntityMatcher
+from src.query_processor.llm_backends import create_llm_backend
+from src.query_processor.response_cache import get_response_cache, context_fingerprint
+from src.retrievers.docfile_retiever import fetch_documents_by_embedding_ids
+from src.retrievers.context_builder import build_code_context, build_document_context
 
 # Setup Logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Gemini API Configuration
-gemini_api_key = os.environ.get("GEMINI_API_KEY")
-if not gemini_api_key:
-    logger.error("GEMINI_API_KEY environment variable is not set!")
-    raise ValueError("Missing GEMINI_API_KEY environment variable.")
-genai.configure(api_key=gemini_api_key)
+# Load configuration once when module is imported
+_full_config = load_config()
+_config = _full_config.get("query", {})
+_extraction_mode = _config.get("entity_extraction", "llm")
+
+# LLM backend (llm.backend / LLM_BACKEND): the live Gemini API, or the offline stub for benchmarks.
+# One client (and model handle) shared by every query
+try:
+    llm_client = create_llm_backend(os.environ.get("GEMINI_API_KEY"))
+except ValueError as e:
+    logger.error("%s", e)
+    raise
+
+def _ingestion_outputs():
+    """Files rewritten by ingestion; a change to any of them means the serving state is stale."""
+    paths = list((_full_config.get("faiss", {}).get("indices") or {}).values())
+    paths.append(_full_config.get("ingestion", {}).get("catalog_path", "./data/catalog/entity_catalog.json"))
+    paths.append(_full_config.get("graphdb", {}).get("graph_storage_path"))
+    return [path for path in paths if path]
+
+def _ingestion_generation():
+    generation = []
+    for path in _ingestion_outputs():
+        try:
+            generation.append(os.stat(path).st_mtime_ns)
+        except FileNotFoundError:
+            generation.append(None)
+    return tuple(generation)
+
+# Taken before loading, so an ingestion finishing during startup triggers a reload
+_serving_generation = _ingestion_generation()
 
 # Initialize IndexManager and FAISSManager
 index_manager = IndexManager()
 code_indexer = index_manager.get_code_indexer()
 doc_indexer = index_manager.get_doc_indexer()
-faiss_manager = FAISSManager() # Assumes FAISSManager is attached to CodeBERTIndexer
+faiss_manager = FAISSManager(read_only=True) # Assumes FAISSManager is attached to CodeBERTIndexer
+verify_indexes()
+entity_catalog = get_entity_catalog()
+
+def _build_entity_matcher():
+    matcher = EntityMatcher(get_typed_entities(), fuzzy_cutoff=_config.get("fuzzy_match_cutoff", 0.85))
+    logger.info("Entity matcher built over %d graph entities.", len(matcher))
+    return matcher
+
+entity_matcher = _build_entity_matcher()
+# Serializes reloads of the indices, catalog, graph and matcher after a re-ingestion
+_refresh_lock = threading.Lock()
+
+response_cache = get_response_cache()
+# Code and documentation retrieval branches run side by side on this pool
+_retrieval_workers = _config.get("retrieval_workers", 8)
+_retrieval_executor = ThreadPoolExecutor(max_workers=_retrieval_workers, thread_name_prefix="retrieval")
+# Branches that missed their deadline but are still running (a started thread cannot be cancelled)
+_abandoned_branches = 0
+_abandoned_lock = threading.Lock()
+
+# Counts how often entity extraction got by without the LLM
+extraction_stats = {"queries": 0, "llm_calls": 0}
+_extraction_stats_lock = threading.Lock()
 
 def preprocess_query(query: str) -> str:
     """
@@ -57,9 +116,9 @@ def call_gemini_api(prompt: str) -> str:
         str: The generated text response from Gemini, or None if the response is empty.
     """
     try:
-        model = genai.GenerativeModel("gemini-2.0-flash")
-        response = model.generate_content(prompt)
-        raw_text = response.text if response and response.text else ""
+        start_time = time.perf_counter()
+        raw_text = llm_client.generate(prompt)
+        logger.info("Gemini call took %.3fs.", time.perf_counter() - start_time)
         if not raw_text.strip():
             logger.error("Received empty response from Gemini API for prompt: %s", prompt)
             return None
@@ -68,6 +127,38 @@ def call_gemini_api(prompt: str) -> str:
         logger.error("Error calling Gemini API: %s", e)
         return None
 
+def stream_gemini_api(prompt: str):
+    """
+    Streams the Gemini answer for a prompt, yielding text chunks as they arrive.
+    Time to first token and total latency are logged separately.
+
+    Args:
+        prompt (str): The prompt to send to Gemini.
+
+    Yields:
+        str: Partial response text, in order.
+
+    Raises:
+        Exception: The upstream error when the stream fails, so a truncated answer
+        is never taken for a complete one.
+    """
+    start_time = time.perf_counter()
+    first_token_seconds = None
+    try:
+        for text in llm_client.stream(prompt):
+            if not text:
+                continue
+            if first_token_seconds is None:
+                first_token_seconds = time.perf_counter() - start_time
+                logger.info("Gemini stream: first token after %.3fs.", first_token_seconds)
+            yield text
+    except Exception as e:
+        logger.error("Error streaming from Gemini API: %s", e)
+        raise
+    if first_token_seconds is None:
+        logger.error("Received empty streamed response from Gemini API for prompt: %s", prompt)
+    logger.info("Gemini stream: complete after %.3fs.", time.perf_counter() - start_time)
+
 def extract_entities_heuristic(query: str):
     """
     Fallback extraction using regex if the Gemini API call fails.
@@ -77,6 +168,19 @@ def extract_entities_heuristic(query: str):
     modules = re.findall(r'\b[A-Z][a-zA-Z0-9_]+\b', query)
     return functions, modules
 
+def heuristic_extraction(query: str) -> dict:
+    """
+    Builds an extraction result without the LLM from extract_entities_heuristic
+    and classify_query, in the same shape as get_extraction_from_gemini.
+    """
+    functions, modules = extract_entities_heuristic(query)
+    classification = classify_query(query)
+    return {
+        "functions": [function[:-2] for function in functions],
+        "modules": modules,
+        "classification": {"code": "code-related", "documentation": "documentation-related"}.get(classification, classification),
+    }
+
 def classify_query(query: str) -> str:
     """
     Heuristically classifies the query as 'code', or 'documentation'.
@@ -88,31 +192,42 @@ def classify_query(query: str) -> str:
         return "code"
     return "Invalid"
 
-def extract_entity_names(code_files):
+def select_candidate_names(query: str) -> dict:
     """
-    Extracts entities of type 'function' or 'class' from the CodeFile Indexer results,
-    and returns them grouped by type.
-
-    Args:
-        code_files (list): Contains objects to be parsed.
-
-    Returns:
-        dict: A dictionary with keys as 'function' or 'class', and values as lists of names (str).
+    Picks the known entity names most likely to be meant by the query, within
+    query.extraction_context_tokens: names the local matcher found, then names
+    defined in the files of the query's nearest code chunks, then names sharing
+    rare identifier tokens with the query.
     """
-    extracted = {"function": [], "class": []}
-
-    for code_file in code_files:
-        entities = code_file.entities
-        for entity in entities:
-            if entity.type in {"function", "class"} and entity.name:
-                extracted[entity.type].append(entity.name)
-    return extracted
+    budget = _config.get("extraction_context_tokens", 2000)
+    match = entity_matcher.match(query)
+    ranked = match.exact + match.partial + match.fuzzy
+
+    neighbours = _config.get("extraction_neighbours", 10)
+    if neighbours:
+        indices, _ = faiss_manager.search(code_indexer.encode_code(query), k=neighbours, index_name=CODE_INDEX)
+        ranked += entity_catalog.entities_for_embedding_ids([i for i in indices if i >= 0])
+    ranked += entity_matcher.related(query)
+
+    selected = {"function": [], "class": []}
+    seen = set()
+    used_tokens = 0
+    for name, entity_type in ranked:
+        if (name, entity_type) in seen:
+            continue
+        cost = estimate_tokens(json.dumps(name)) + 1
+        if used_tokens + cost > budget:
+            break
+        seen.add((name, entity_type))
+        selected.setdefault(entity_type, []).append(name)
+        used_tokens += cost
+    return selected
 
 def get_extraction_from_gemini(query: str) -> dict:
     """
     Uses the Gemini API to extract entities and classify the query.
     This version includes additional context: the known function and class names
-    extracted from the repository metadata. If the API call fails or the output is
+    most relevant to the query (see select_candidate_names). If the API call fails or the output is
     invalid, it falls back to heuristic extraction.
     
     Args:
@@ -121,9 +236,14 @@ def get_extraction_from_gemini(query: str) -> dict:
     Returns:
         dict: A dictionary with keys "functions", "modules", and "classification".
     """
-    # Get the known entity names from the repository metadata
-    extracted_names = extract_entity_names(fetch_all_code_files())
-    context_json = json.dumps(extracted_names, indent=2)
+    if not llm_client.available():
+        # Fail fast while the upstream is degraded instead of building a prompt that cannot be sent
+        logger.warning("Gemini circuit is open; using heuristic extraction.")
+        return heuristic_extraction(query)
+
+    # Only the candidate names relevant to this query, not every name in the repository
+    extracted_names = select_candidate_names(query)
+    context_json = json.dumps(extracted_names, separators=(",", ":"))
 
     extraction_prompt = (
         "You are an assistant that classifies developer queries and extracts mentioned entities.\n\n"
@@ -146,14 +266,13 @@ def get_extraction_from_gemini(query: str) -> dict:
         "- Return a valid JSON object with keys: \"functions\", \"modules\", and \"classification\".\n"
         "- Double quotes must be used in JSON keys and string values.\n\n"
     )
-
+    logger.info("Extraction prompt: %d candidate names, ~%d tokens.",
+                sum(len(names) for names in extracted_names.values()), estimate_tokens(extraction_prompt))
 
     response = call_gemini_api(extraction_prompt)
     if response is None:
         logger.warning("Gemini API call failed for extraction; using heuristic extraction.")
-        functions, modules = extract_entities_heuristic(query)
-        classification = classify_query(query)
-        return {"functions": functions, "modules": modules, "classification": classification}
+        return heuristic_extraction(query)
     
     try:
         data = json.loads(response)
@@ -164,15 +283,11 @@ def get_extraction_from_gemini(query: str) -> dict:
             data = json.loads(fixed_response)
         except Exception as e2:
             logger.error("Error processing Gemini extraction response after fixing quotes: %s", e2)
-            functions, modules = extract_entities_heuristic(query)
-            classification = classify_query(query)
-            return {"functions": functions, "modules": modules, "classification": classification}
+            return heuristic_extraction(query)
     
     if not all(key in data for key in ["functions", "modules", "classification"]):
         logger.error("Missing keys in Gemini extraction response. Response was: %s", data)
-        functions, modules = extract_entities_heuristic(query)
-        classification = classify_query(query)
-        return {"functions": functions, "modules": modules, "classification": classification}
+        return heuristic_extraction(query)
     
     # If the query is code-related but no valid entities were found, terminate with an error.
     if data.get("classification") == "code-related" and not data.get("functions") and not data.get("modules"):
@@ -181,6 +296,72 @@ def get_extraction_from_gemini(query: str) -> dict:
     
     return data
 
+def extract_entities_locally(query: str):
+    """
+    Resolves mentioned entities with the local matcher. Returns the extraction dict
+    in the same shape as get_extraction_from_gemini and whether the match was ambiguous.
+    """
+    match = entity_matcher.match(query)
+    entities = match.entities()
+    data = {
+        "functions": [name for name, entity_type in entities if entity_type == "function"],
+        "modules": [name for name, entity_type in entities if entity_type != "function"],
+        "classification": "code-related" if entities else "documentation-related",
+    }
+    # No candidate names at all plus documentation wording is settled locally too
+    no_candidates = not (match.exact or match.partial or match.fuzzy)
+    ambiguous = match.ambiguous and not (no_candidates and classify_query(query) == "documentation")
+    return data, ambiguous
+
+def extract_entities(query: str) -> dict:
+    """
+    Extracts entities and classifies the query according to query.entity_extraction:
+    the LLM is always asked ("llm"), never asked ("local"), or only asked when the
+    local matcher is ambiguous ("hybrid").
+    """
+    llm_call = _extraction_mode == "llm"
+    if not llm_call:
+        data, ambiguous = extract_entities_locally(query)
+        llm_call = _extraction_mode != "local" and ambiguous
+
+    _record_extraction(llm_call)
+    return get_extraction_from_gemini(query) if llm_call else data
+
+def refresh_serving_state():
+    """
+    Picks up a re-ingestion: when ingestion has rewritten the FAISS indices, the
+    entity catalog or the call graph, all of them are re-read, the entity matcher
+    is rebuilt and cached answers are dropped, so nothing is answered (or cached)
+    from stale in-memory state. Returns True if anything was reloaded.
+    """
+    global entity_matcher, _serving_generation
+    if _ingestion_generation() == _serving_generation:
+        return False
+    with _refresh_lock:
+        generation = _ingestion_generation()
+        if generation == _serving_generation:
+            return False
+        start_time = time.perf_counter()
+        faiss_manager.reload()
+        entity_catalog.reload_if_changed()
+        reload_graph()
+        entity_matcher = _build_entity_matcher()
+        if response_cache is not None:
+            response_cache.clear()
+        _serving_generation = generation
+    logger.info("Reloaded serving state after ingestion in %.2fs.", time.perf_counter() - start_time)
+    return True
+
+def _record_extraction(llm_call):
+    """Counts an extraction (worker threads share the counters) and logs how often the LLM was avoided."""
+    with _extraction_stats_lock:
+        extraction_stats["queries"] += 1
+        if llm_call:
+            extraction_stats["llm_calls"] += 1
+        queries, llm_calls = extraction_stats["queries"], extraction_stats["llm_calls"]
+    avoided = queries - llm_calls
+    logger.info("LLM extraction avoided for %d of %d queries (%.1f%%).", avoided, queries, 100.0 * avoided / queries)
+
 def build_faiss_query_from_graph(node_name):
     deps = get_dependencies(node_name)
     query_parts = [f"Node: {node_name}"]
@@ -192,39 +373,109 @@ def build_faiss_query_from_graph(node_name):
 def get_context_for_code(nodes):
     if not nodes:
         print("No relevant functions or modules found.")
-        return
+        return []
 
     print(f"Nodes identified: {nodes}")
-    faiss_queries = {node: build_faiss_query_from_graph(node) for node in nodes}
-    context_parts = []
-
-    for node, query_code in faiss_queries.items():
-        embedding = code_indexer.encode_code(query_code)
-        indices, _ = faiss_manager.search(embedding)
-        print(indices, type(indices))
-        if indices is None or len(indices) == 0:
+    faiss_queries = [build_faiss_query_from_graph(node) for node in nodes]
+
+    # One encoder pass and one FAISS call for all nodes
+    embeddings = code_indexer.encode_codes(faiss_queries)
+    all_indices, _ = faiss_manager.search_batch(embeddings, index_name=CODE_INDEX)
+
+    # Resolve every node's hits with one Mongo round trip
+    codefiles = fetch_code_files_by_embedding_ids([i for indices in all_indices for i in indices])
+    codefile_by_id = {embedding_id: codefile for codefile in codefiles for embedding_id in codefile.embedding_ids}
+
+    # Group nodes by the file of their best hit that resolves; orphaned vectors left
+    # behind by re-indexed or deleted files are skipped in favour of the next hit
+    nodes_by_file = {}
+    for node, indices in zip(nodes, all_indices):
+        codefile = next((codefile_by_id[int(i)] for i in indices if int(i) in codefile_by_id), None)
+        if codefile is None:
             continue
-        codefile = fetch_code_file_by_embedding_id(indices[0])
-        print(codefile.file_path)
-        print(codefile.raw_code)
-        context_parts.append(f"\nNode: {node}\n\nRaw Code:\n{codefile.raw_code}\n")
+        nodes_by_file.setdefault(codefile.file_path, (codefile, []))[1].append(node)
+
+    # Only each entity's own source span and its callees' signatures go into the prompt
+    context_parts = build_code_context(nodes_by_file.values())
     if not context_parts:
         print("No code context retrieved.")
-        return
+        return []
 
     return context_parts
 
 def get_context_for_document(query):
+    """Returns the matching documentation sections and the query embedding they were retrieved with."""
     embedding = doc_indexer.encode_document(query)
-    indices, _ = faiss_manager.search(embedding)
+    indices, _ = faiss_manager.search(embedding, index_name=DOC_INDEX)
     if indices is None or len(indices) == 0:
         print("No index. Embedding not found")
-        return
-    docfile = fetch_document_by_embedding_id(indices[0])
-    return docfile.raw_content
+        return [], embedding
+    # Hits come back in rank order, so an orphaned top hit falls through to the next one
+    docfiles = fetch_documents_by_embedding_ids(indices)
+    if not docfiles:
+        print("No document found for the closest embeddings")
+        return [], embedding
+    # The sections of the document that match the query, not the whole file
+    return build_document_context(docfiles[0], query), embedding
+
+def _run_branch(name, function, args):
+    try:
+        return function(*args)
+    except Exception as e:
+        logger.error("Retrieval branch '%s' failed: %s", name, e)
+        return None
 
-def extract_documentation_related_response(query):
-    document_context = get_context_for_document(query)    
+def _forget_abandoned_branch(_):
+    global _abandoned_branches
+    with _abandoned_lock:
+        _abandoned_branches -= 1
+
+def retrieve_concurrently(branches, timeout=None):
+    """
+    Runs independent retrieval branches, given as {name: (function, args)}, on the
+    retrieval pool and waits at most query.retrieval_timeout_seconds for them. A branch
+    that misses the deadline or fails contributes None (no context), so a slow
+    branch degrades the answer instead of blocking it.
+
+    A single branch runs inline on the calling thread. A branch that missed its
+    deadline keeps its worker until it finishes; while such branches leave fewer
+    free workers than there are branches, the branches run inline too instead of
+    queueing behind them.
+    """
+    global _abandoned_branches
+    timeout = timeout or _config.get("retrieval_timeout_seconds", 10)
+    start_time = time.perf_counter()
+
+    with _abandoned_lock:
+        free_workers = _retrieval_workers - _abandoned_branches
+    if len(branches) == 1 or free_workers < len(branches):
+        if len(branches) > 1:
+            logger.warning("Retrieval pool busy with %d abandoned branches; running %s inline.",
+                           _retrieval_workers - free_workers, ", ".join(branches))
+        results = {name: _run_branch(name, function, args) for name, (function, args) in branches.items()}
+        logger.info("Retrieval took %.3fs (%s).", time.perf_counter() - start_time, ", ".join(branches))
+        return results
+
+    futures = {name: _retrieval_executor.submit(_run_branch, name, function, args) for name, (function, args) in branches.items()}
+    done, _ = wait(futures.values(), timeout=timeout)
+
+    results = {}
+    for name, future in futures.items():
+        if future in done:
+            results[name] = future.result()
+            continue
+        logger.warning("Retrieval branch '%s' missed the %.1fs deadline; answering without it.", name, timeout)
+        results[name] = None
+        if not future.cancel():
+            with _abandoned_lock:
+                _abandoned_branches += 1
+            future.add_done_callback(_forget_abandoned_branch)
+    logger.info("Retrieval took %.3fs (%s).", time.perf_counter() - start_time, ", ".join(branches))
+    return results
+
+def extract_documentation_related_response(query, stream=False):
+    document_context, query_embedding = retrieve_concurrently(
+        {"documentation": (get_context_for_document, (query,))})["documentation"] or ([], None)
 
     llm_context = (
         f"The user asked the following documentation-related query:\n\"{query}\"\n\n"
@@ -238,12 +489,15 @@ def extract_documentation_related_response(query):
         "- If the documentation does not directly address the query, say so explicitly.\n"
     )
 
-    response = call_gemini_api(llm_context)
-    return response
+    return answer_with_cache(query, llm_context, context_fingerprint(document_context), query_embedding, stream)
 
-def extract_code_related_response(nodes, query):
-    code_context = get_context_for_code(nodes)
-    document_context = get_context_for_document(query)  
+def extract_code_related_response(nodes, query, stream=False):
+    contexts = retrieve_concurrently({
+        "code": (get_context_for_code, (nodes,)),
+        "documentation": (get_context_for_document, (query,)),
+    })
+    code_context = contexts["code"] or []
+    document_context, query_embedding = contexts["documentation"] or ([], None)
 
     llm_context = (
         f"The user has asked the following query related to code entities: {query}\n\n"
@@ -264,30 +518,112 @@ def extract_code_related_response(nodes, query):
         "- Provide a clear and technically grounded explanation.\n"
     )
 
+    return answer_with_cache(query, llm_context, context_fingerprint(nodes, code_context, document_context),
+                             query_embedding, stream)
+
+def answer_with_cache(query, llm_context, fingerprint, query_embedding=None, stream=False):
+    """
+    Returns the LLM answer for the prompt, reusing a cached answer to the same
+    (or, in semantic mode, a similar) query over the same retrieved context.
+    query_embedding is the documentation embedding computed during retrieval.
+    With stream=True the answer is returned as an iterator of text chunks.
+    """
+    if response_cache is None:
+        return stream_gemini_api(llm_context) if stream else call_gemini_api(llm_context)
+
+    if not response_cache.semantic:
+        query_embedding = None
+    response = response_cache.get(query, fingerprint, query_embedding)
+    response_cache.log_stats()
+    if response is not None:
+        return iter([response]) if stream else response
+
+    if stream:
+        return _stream_into_cache(stream_gemini_api(llm_context), query, fingerprint, query_embedding)
     response = call_gemini_api(llm_context)
+    if response is not None:
+        response_cache.put(query, fingerprint, response, query_embedding)
     return response
 
-def process_query(query: str) -> None:
+def _stream_into_cache(chunks, query, fingerprint, query_embedding):
     """
-    Processes a user query by classifying and extracting relevant code/documentation context,
-    and prints the final LLM response.
+    Passes streamed chunks through and caches the full answer once the stream
+    completes. A stream that fails raises before anything is cached.
+    """
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    if parts:
+        response_cache.put(query, fingerprint, "".join(parts), query_embedding)
+
+def answer_query(query: str, stream: bool = False) -> dict:
+    """
+    Classifies a user query, retrieves the relevant code/documentation context and
+    returns the LLM answer as {"query", "classification", "nodes", "response"}.
+    With stream=True, "response" is an iterator of text chunks; retrieval has
+    already finished when answer_query returns.
     """
     query = preprocess_query(query)
-    extracted_data = get_extraction_from_gemini(query)
+    refresh_serving_state()
+    extracted_data = extract_entities(query)
     classification = extracted_data.get("classification")
+    result = {"query": query, "classification": classification, "nodes": [], "response": iter([]) if stream else None}
 
     if classification == "code-related":
-        print("Classification: Code-related")
-        nodes = list(filter(entity_exists, extracted_data.get("functions", []) + extracted_data.get("modules", [])))
-        response = extract_code_related_response(nodes, query)
-        print("Final Response:\n", response)
+        result["nodes"] = list(filter(entity_exists, extracted_data.get("functions", []) + extracted_data.get("modules", [])))
+        result["response"] = extract_code_related_response(result["nodes"], query, stream)
+    elif classification == "documentation-related":
+        result["response"] = extract_documentation_related_response(query, stream)
+    return result
+
+def process_query(query: str, stream: bool = None) -> None:
+    """
+    Processes a user query by classifying and extracting relevant code/documentation context,
+    and prints the final LLM response. With streaming (query.stream_responses by default)
+    the response is printed as it arrives.
+    """
+    stream = _config.get("stream_responses", False) if stream is None else stream
+    start_time = time.perf_counter()
+    result = answer_query(query, stream)
+    classification = result["classification"]
 
+    if classification == "code-related":
+        print("Classification: Code-related")
     elif classification == "documentation-related":
         print("Classification: Documentation-related")
-        response = extract_documentation_related_response(query)
-        print("Final Response:\n", response)
     else:
         print("Invalid classification")
+        return
+
+    if not stream:
+        print("Final Response:\n", result["response"])
+        return
+
+    print("Final Response:\n", end=" ", flush=True)
+    first_token_seconds = None
+    try:
+        for chunk in result["response"]:
+            if first_token_seconds is None:
+                first_token_seconds = time.perf_counter() - start_time
+            print(chunk, end="", flush=True)
+    finally:
+        print()
+    if first_token_seconds is not None:
+        logger.info("Query answered: first token after %.3fs, complete after %.3fs.",
+                    first_token_seconds, time.perf_counter() - start_time)
+
+def warm_up():
+    """
+    Runs one inference through every model and index on the query path, so the
+    first real query does not pay for lazy initialisation or cold index pages.
+    """
+    code_indexer.warm_up()
+    doc_indexer.warm_up()
+    faiss_manager.search(np.zeros(code_indexer.embedding_dim, dtype=np.float32), k=1, index_name=CODE_INDEX)
+    faiss_manager.search(np.zeros(doc_indexer.embedding_dim, dtype=np.float32), k=1, index_name=DOC_INDEX)
+    entity_matcher.match("warm up")
+    logger.info("Query processor warmed up.")
 
 def interactive_query_loop():
     print("Welcome to CodeCompass Query System! Type your query below, or type 'exit' to quit.")
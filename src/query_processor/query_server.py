@@ -0,0 +1,268 @@
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.utils.config_loader import load_config
+from src.utils.logging_utils import setup_logger, log_info, log_error, log_warning
+
+logger = setup_logger()
+
+# Load configuration once when module is imported
+_config = load_config().get("query_server", {})
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 503: "Service Unavailable", 500: "Internal Server Error"}
+
+class QueryServer:
+    """
+    Long-running HTTP/JSON front end for the query processor. Models, FAISS
+    indices and the Mongo connection are loaded once, in the background, and the
+    server only reports ready after a warm-up inference.
+
+    Endpoints:
+        GET  /health  Liveness; answers as soon as the socket is open.
+        GET  /ready   200 once models are loaded and warmed up, 503 before.
+        POST /query   {"query": "..."} -> {"query", "classification", "nodes", "response"}.
+                      With "stream": true the answer is sent as chunked NDJSON: a header line
+                      with the classification and nodes, one {"delta": "..."} line per chunk
+                      and a final line with first-token and total latency, or an {"error": "..."}
+                      line if the answer stream fails partway.
+
+    Queries run on a thread pool (model inference releases the GIL) and at most
+    max_concurrent_queries run at once; beyond max_queued_queries waiting
+    requests, new ones are rejected with 503 instead of piling up.
+    """
+    def __init__(self, host=None, port=None, max_concurrent_queries=None, max_queued_queries=None, workers=None):
+        self.host = host or _config.get("host", "0.0.0.0")
+        self.port = port or _config.get("port", 8080)
+        self.max_concurrent_queries = max_concurrent_queries or _config.get("max_concurrent_queries", 4)
+        self.max_queued_queries = max_queued_queries if max_queued_queries is not None else _config.get("max_queued_queries", 32)
+        self.max_body_bytes = _config.get("max_body_bytes", 65536)
+        self.request_timeout_seconds = _config.get("request_timeout_seconds", 120)
+
+        self._executor = ThreadPoolExecutor(max_workers=workers or _config.get("workers", self.max_concurrent_queries),
+                                            thread_name_prefix="query-worker")
+        self._semaphore = None
+        self._in_flight = 0
+        self._query_processor = None
+        self._load_error = None
+
+    @property
+    def ready(self):
+        return self._query_processor is not None
+
+    def _load_query_processor(self):
+        # Importing the module loads the models, indices and Mongo connection exactly once
+        from src.query_processor import query_processor
+        query_processor.warm_up()
+        return query_processor
+
+    async def _load(self):
+        start_time = time.perf_counter()
+        try:
+            self._query_processor = await asyncio.get_running_loop().run_in_executor(self._executor, self._load_query_processor)
+            log_info(logger, f"Query server ready after {time.perf_counter() - start_time:.1f}s of loading and warm-up.")
+        except Exception as e:
+            self._load_error = str(e)
+            log_error(logger, f"Query server failed to load the query processor: {e}")
+
+    def _release_after(self, future, close=None):
+        """
+        Frees the admission slot once the worker future has finished. A request that
+        timed out or whose client went away keeps its slot until its thread is done,
+        so at most max_concurrent_queries queries ever run at once.
+        """
+        def release(_=None):
+            try:
+                if close is not None:
+                    close()
+            except Exception as e:
+                log_warning(logger, f"Failed to close an abandoned answer stream: {e}")
+            finally:
+                self._semaphore.release()
+                self._in_flight -= 1
+
+        if future.done():
+            release()
+        else:
+            future.add_done_callback(release)
+
+    async def _submit(self, *args):
+        """Waits for an admission slot, then starts answer_query(*args) on the worker pool."""
+        try:
+            await self._semaphore.acquire()
+        except BaseException:
+            self._in_flight -= 1
+            raise
+        return asyncio.get_running_loop().run_in_executor(self._executor, self._query_processor.answer_query, *args)
+
+    async def _answer(self, payload):
+        query = payload.get("query") if isinstance(payload, dict) else None
+        if not isinstance(query, str) or not query.strip():
+            return 400, {"error": "Body must be a JSON object with a non-empty \"query\" string."}
+        if not self.ready:
+            return 503, {"error": "Query processor is still loading."}
+        if self._in_flight >= self.max_concurrent_queries + self.max_queued_queries:
+            return 503, {"error": "Too many queries in flight, retry later."}
+
+        # Counted from admission, so bursts of streamed requests are limited too
+        self._in_flight += 1
+        if payload.get("stream"):
+            lines = self._stream_answer(query)
+            # Retrieval runs here, so its errors and timeouts are still plain JSON responses
+            header = await lines.__anext__()
+            return 200, (header, lines)
+
+        future = await self._submit(query)
+        self._release_after(future)
+        start_time = time.perf_counter()
+        result = await asyncio.wait_for(asyncio.shield(future), timeout=self.request_timeout_seconds)
+        result["latency_seconds"] = round(time.perf_counter() - start_time, 3)
+        return 200, result
+
+    async def _stream_answer(self, query):
+        """
+        Yields NDJSON lines for a streamed answer; the blocking stream is consumed on the
+        worker pool. The admission slot (and the LLM call slot held by the stream) is
+        released when the generator is closed and its last worker call has finished.
+        A stream that fails partway ends with an {"error": ...} line instead of {"done": true}.
+        """
+        loop = asyncio.get_running_loop()
+        pending = await self._submit(query, True)
+        chunks = None
+
+        def close_chunks():
+            if chunks is not None:
+                chunks.close()
+
+        try:
+            start_time = time.perf_counter()
+            result = await asyncio.wait_for(asyncio.shield(pending), timeout=self.request_timeout_seconds)
+            chunks = result.pop("response")
+            yield result
+
+            first_token_seconds = None
+            while True:
+                pending = loop.run_in_executor(self._executor, next, chunks, None)
+                try:
+                    chunk = await asyncio.shield(pending)
+                except Exception as e:
+                    # The answer so far is truncated; report the failure instead of done
+                    log_warning(logger, f"Answer stream failed: {e}")
+                    yield {"error": f"Answer stream failed: {e}"}
+                    return
+                if chunk is None:
+                    break
+                if first_token_seconds is None:
+                    first_token_seconds = round(time.perf_counter() - start_time, 3)
+                yield {"delta": chunk}
+            yield {"done": True, "first_token_seconds": first_token_seconds,
+                   "latency_seconds": round(time.perf_counter() - start_time, 3)}
+        finally:
+            self._release_after(pending, close_chunks)
+
+    async def _route(self, method, path, body):
+        if path == "/health":
+            return 200, {"status": "ok"}
+        if path == "/ready":
+            if self.ready:
+                return 200, {"ready": True}
+            return 503, {"ready": False, "error": self._load_error}
+        if path == "/query":
+            if method != "POST":
+                return 405, {"error": "Use POST."}
+            try:
+                payload = json.loads(body or b"{}")
+            except json.JSONDecodeError as e:
+                return 400, {"error": f"Invalid JSON: {e}"}
+            return await self._answer(payload)
+        return 404, {"error": f"No route for {path}"}
+
+    async def _handle_connection(self, reader, writer):
+        status, response = 500, {"error": "Internal server error"}
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            if len(request_line) < 2:
+                status, response = 400, {"error": "Malformed request line."}
+            else:
+                length = int(headers.get("content-length", 0) or 0)
+                if length > self.max_body_bytes:
+                    status, response = 413, {"error": f"Body exceeds {self.max_body_bytes} bytes."}
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    status, response = await self._route(request_line[0].upper(), request_line[1].split("?")[0], body)
+        except asyncio.TimeoutError:
+            status, response = 503, {"error": f"Query exceeded {self.request_timeout_seconds}s."}
+            log_warning(logger, response["error"])
+        except Exception as e:
+            log_error(logger, f"Query server request failed: {e}")
+            status, response = 500, {"error": str(e)}
+
+        try:
+            if isinstance(response, tuple):
+                await self._write_stream(writer, status, *response)
+            else:
+                body = json.dumps(response).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+                )
+                await writer.drain()
+        except Exception as e:
+            log_error(logger, f"Query server failed to send a response: {e}")
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _write_line(writer, line):
+        data = json.dumps(line).encode("utf-8") + b"\n"
+        writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n")
+
+    async def _write_stream(self, writer, status, header, lines):
+        """
+        Sends the header object and then an async iterator of JSON objects as chunked
+        NDJSON, flushing each line. The iterator is always closed, so a client that
+        disconnects mid-stream frees its slots right away.
+        """
+        try:
+            writer.write(
+                f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/x-ndjson\r\nTransfer-Encoding: chunked\r\nConnection: close\r\n\r\n".encode("latin-1")
+            )
+            self._write_line(writer, header)
+            await writer.drain()
+            async for line in lines:
+                self._write_line(writer, line)
+                await writer.drain()
+        except Exception as e:
+            if isinstance(e, ConnectionError) or writer.is_closing():
+                log_warning(logger, f"Client disconnected from a streamed query: {e}")
+                return
+            # Headers are already sent, so the failure is reported in-band
+            log_error(logger, f"Streamed query failed: {e}")
+            self._write_line(writer, {"error": str(e) or type(e).__name__})
+        finally:
+            await lines.aclose()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def serve(self):
+        self._semaphore = asyncio.Semaphore(self.max_concurrent_queries)
+        server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        log_info(logger, f"Query server listening on {self.host}:{self.port}")
+        loader = asyncio.create_task(self._load())
+        async with server:
+            await server.serve_forever()
+        await loader
+
+if __name__ == "__main__":
+    asyncio.run(QueryServer().serve())
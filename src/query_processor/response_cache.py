@@ -0,0 +1,129 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from src.utils.config_loader import load_config
+from src.utils.logging_utils import setup_logger, log_info
+
+logger = setup_logger()
+
+# Load configuration once when module is imported
+_config = load_config().get("response_cache", {})
+
+_response_cache = None
+
+def get_response_cache():
+    """Returns the shared response cache, or None when it is disabled."""
+    global _response_cache
+    if _response_cache is None and _config.get("enabled", False):
+        _response_cache = ResponseCache(
+            max_entries=_config.get("max_entries", 1000),
+            ttl_seconds=_config.get("ttl_seconds", 3600),
+            semantic=_config.get("semantic", False),
+            similarity_threshold=_config.get("similarity_threshold", 0.95),
+        )
+    return _response_cache
+
+def normalize_query(query: str) -> str:
+    """Lowercases, collapses whitespace and drops trailing punctuation."""
+    return re.sub(r"\s+", " ", query.strip().lower()).rstrip("?!. ")
+
+def context_fingerprint(*context_parts) -> str:
+    """Hash of the exact retrieved context that the answer prompt is built from."""
+    digest = hashlib.sha256()
+    for parts in context_parts:
+        for part in parts or []:
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        digest.update(b"\1")
+    return digest.hexdigest()
+
+class ResponseCache:
+    """
+    In-memory LRU cache of LLM answers keyed by (normalized query, context fingerprint).
+    Entries expire after ttl_seconds; the query processor clears the cache when it
+    reloads its indices after an ingestion run. In semantic mode, a query whose
+    embedding has at least similarity_threshold cosine similarity with a cached
+    query over the same context is also a hit.
+    """
+    def __init__(self, max_entries=1000, ttl_seconds=3600, semantic=False, similarity_threshold=0.95):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.semantic = semantic
+        self.similarity_threshold = similarity_threshold
+
+        self._entries = OrderedDict()  # (query, fingerprint) -> (response, unit embedding or None, stored at)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def clear(self):
+        """Drops every cached answer; called once the serving indices have been reloaded."""
+        with self._lock:
+            if self._entries:
+                log_info(logger, f"Serving indices reloaded; dropping {len(self._entries)} cached responses.")
+            self._entries.clear()
+            self.invalidations += 1
+
+    @staticmethod
+    def _unit(embedding):
+        if embedding is None:
+            return None
+        embedding = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm else embedding
+
+    def get(self, query, fingerprint, query_embedding=None):
+        """Returns the cached response for the query over this context, or None."""
+        key = (normalize_query(query), fingerprint)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[2] <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+            if self.semantic and query_embedding is not None:
+                query_unit = self._unit(query_embedding)
+                for other_key, (response, unit, stored_at) in reversed(self._entries.items()):
+                    if other_key[1] != fingerprint or unit is None or now - stored_at > self.ttl_seconds:
+                        continue
+                    if float(np.dot(query_unit, unit)) >= self.similarity_threshold:
+                        self._entries.move_to_end(other_key)
+                        self.semantic_hits += 1
+                        return response
+
+            self.misses += 1
+            return None
+
+    def put(self, query, fingerprint, response, query_embedding=None):
+        key = (normalize_query(query), fingerprint)
+        with self._lock:
+            self._entries[key] = (response, self._unit(query_embedding), time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        lookups = self.hits + self.semantic_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": (self.hits + self.semantic_hits) / lookups if lookups else 0.0,
+        }
+
+    def log_stats(self):
+        stats = self.stats()
+        log_info(logger, f"Response cache: {stats['hits']} hits, {stats['semantic_hits']} semantic hits, "
+                    f"{stats['misses']} misses ({stats['hit_rate']:.1%} hit rate).")
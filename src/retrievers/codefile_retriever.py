@@ -1,21 +1,17 @@
 from typing import List
 from src.ingestion.data_models import CodeFile, CodeEntity, FunctionCall
-from src.utils.mongodb_utils import fetch_raw_code_by_path, fetch_all_raw_code, fetch_codefile_doc_by_embedding_id
-from src.utils.logging_utils import log_error
+from src.utils.mongodb_utils import fetch_raw_code_by_path, fetch_all_raw_code, fetch_codefile_doc_by_embedding_id, fetch_codefile_docs_by_embedding_ids
+from src.utils.logging_utils import setup_logger, log_error, log_warning
 
-def fetch_code_file_by_file_path(file_path: str) -> CodeFile:
+logger = setup_logger()
+
+def _to_code_file(document) -> CodeFile:
     """
-    Data transfer object (DTO) transformer form DB docs
+    Data transfer object (DTO) transformer from DB docs
     """
-    document = fetch_raw_code_by_path(file_path)
-    
-    if not document:
-        log_error(f"No document found for file_path: {file_path}")
-        return None
-
     entities = [CodeEntity(**entity) for entity in document.get('entities', [])]
     function_calls = [FunctionCall(**fc) for fc in document.get('function_calls', [])]
-    
+
     return CodeFile(
         file_path=document.get('file_path'),
         entities=entities,
@@ -29,54 +25,52 @@ def fetch_code_file_by_file_path(file_path: str) -> CodeFile:
         type=document.get('type', 'CodeFile.class')
     )
 
+def fetch_code_file_by_file_path(file_path: str) -> CodeFile:
+    document = fetch_raw_code_by_path(file_path)
+    
+    if not document:
+        log_error(logger, f"No document found for file_path: {file_path}")
+        return None
+
+    return _to_code_file(document)
+
 def fetch_code_file_by_embedding_id(embedding_id: int) -> CodeFile:
-    """
-    Data transfer object (DTO) transformer from DB docs
-    """
     document = fetch_codefile_doc_by_embedding_id(embedding_id)
     
     if not document:
-        log_error(f"No document found for embedding_id: {embedding_id}")
+        log_error(logger, f"No document found for embedding_id: {embedding_id}")
         return None
-    
-    entities = [CodeEntity(**entity) for entity in document.get('entities', [])]
-    function_calls = [FunctionCall(**fc) for fc in document.get('function_calls', [])]
-    
-    return CodeFile(
-        file_path=document.get('file_path'),
-        entities=entities,
-        raw_code=document.get('raw_code'),
-        cleaned_code=document.get('cleaned_code'),
-        docstrings=document.get('docstrings', []),
-        function_calls=function_calls,
-        imports=document.get('imports', []),
-        global_variables=document.get('global_variables', []),
-        embedding_ids=document.get('embedding_ids', []),
-        type=document.get('type', 'CodeFile.class')
-    )
 
-def fetch_all_code_files() -> List[CodeFile]:
+    return _to_code_file(document)
+
+def fetch_code_files_by_embedding_ids(embedding_ids) -> List[CodeFile]:
     """
-    Data transfer object (DTO) transformer form DB docs
+    Resolves FAISS hits to code files in one round trip. A file hit by several
+    chunks is returned once, at the rank of its best hit.
     """
-    documents = fetch_all_raw_code()
-    
+    # FAISS pads rows with -1 when fewer than k vectors match
+    embedding_ids = [int(i) for i in embedding_ids if i >= 0]
+    if not embedding_ids:
+        return []
+
+    owners = {}
+    for document in fetch_codefile_docs_by_embedding_ids(embedding_ids):
+        for embedding_id in document.get('embedding_ids', []):
+            owners[embedding_id] = document
+
     code_files = []
-    for document in documents:
-        entities = [CodeEntity(**entity) for entity in document.get('entities', [])]
-        function_calls = [FunctionCall(**fc) for fc in document.get('function_calls', [])]
-        
-        code_files.append(CodeFile(
-            file_path=document.get('file_path'),
-            entities=entities,
-            raw_code=document.get('raw_code'),
-            cleaned_code=document.get('cleaned_code'),
-            docstrings=document.get('docstrings', []),
-            function_calls=function_calls,
-            imports=document.get('imports', []),
-            global_variables=document.get('global_variables', []),
-            embedding_ids=document.get('embedding_ids', []),
-            type=document.get('type', 'CodeFile.class')
-        ))
-    
+    seen = set()
+    for embedding_id in embedding_ids:
+        document = owners.get(embedding_id)
+        if document is None or document['file_path'] in seen:
+            continue
+        seen.add(document['file_path'])
+        code_files.append(_to_code_file(document))
+
+    missing = sum(embedding_id not in owners for embedding_id in embedding_ids)
+    if missing:
+        log_warning(logger, f"No document found for {missing} of {len(embedding_ids)} embedding ids")
     return code_files
+
+def fetch_all_code_files() -> List[CodeFile]:
+    return [_to_code_file(document) for document in fetch_all_raw_code()]
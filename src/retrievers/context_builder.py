@@ -0,0 +1,116 @@
+import re
+from typing import List
+
+from src.retrievers.graphdb_retriever import get_callees, get_entity
+from src.utils.config_loader import load_config
+from src.utils.token_utils import estimate_tokens
+
+# Load configuration once when module is imported
+_config = load_config().get("query", {})
+
+_HEADING_PATTERN = re.compile(r"^#{1,6}\s+.+$", re.MULTILINE)
+_WORD_PATTERN = re.compile(r"[A-Za-z0-9_]+")
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """Cuts text to roughly max_tokens, on a line boundary where possible."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    cut = text[:max(0, max_tokens * 4 - 20)]
+    if "\n" in cut:
+        cut = cut[:cut.rfind("\n")]
+    return f"{cut}\n... (truncated)"
+
+def entity_span(code_file, entity_name):
+    """
+    Returns (source, start_line, end_line) of an entity defined in code_file, or None
+    when the file does not define it or was ingested before line spans were recorded.
+    """
+    for entity in code_file.entities:
+        if entity.name == entity_name and entity.end_line_number:
+            # Files ingested before decorators were tracked start at the def/class line
+            start = entity.start_line_number or entity.line_number
+            # ast numbers lines on "\n" only; splitlines() also breaks on \f, \x1c, \u2028, ...
+            lines = code_file.raw_code.split("\n")
+            return "\n".join(lines[start - 1:entity.end_line_number]), start, entity.end_line_number
+    return None
+
+def callee_signatures(entity_name) -> List[str]:
+    """Signatures of the entities called by entity_name, taken from the call graph."""
+    signatures = []
+    for callee in get_callees(entity_name):
+        # Calls recorded as "obj.method" resolve to the definition of "method"
+        attributes = get_entity(callee) or {}
+        if not attributes.get("signature") and "." in callee:
+            attributes = get_entity(callee.rsplit(".", 1)[1]) or {}
+        if attributes.get("signature"):
+            signatures.append(f"{attributes['signature']}  # {attributes.get('file_path')}:{attributes.get('line_number')}")
+    return signatures
+
+def build_code_context(nodes_by_file, max_tokens=None) -> List[str]:
+    """
+    Builds prompt parts for the matched code entities. Each entity contributes
+    only its own source span plus the signatures of its direct callees; whole
+    files are used only for entities without a recorded span. Parts are added in
+    order until the query.code_context_tokens budget is spent.
+
+    Args:
+        nodes_by_file: Iterable of (CodeFile, [entity names]) pairs.
+    """
+    remaining = max_tokens or _config.get("code_context_tokens", 6000)
+    context_parts = []
+
+    for code_file, nodes in nodes_by_file:
+        for node in nodes:
+            if remaining <= 0:
+                return context_parts
+
+            span = entity_span(code_file, node)
+            if span:
+                source, start, end = span
+                part = f"\nNode: {node} ({code_file.file_path}:{start}-{end})\n\nSource:\n{source}\n"
+            else:
+                part = f"\nNode: {node} ({code_file.file_path})\n\nRaw Code:\n{code_file.raw_code}\n"
+
+            signatures = callee_signatures(node)
+            if signatures:
+                part += "\nCalls:\n" + "\n".join(signatures) + "\n"
+
+            part = _truncate(part, remaining)
+            context_parts.append(part)
+            remaining -= estimate_tokens(part)
+
+            if not span:
+                # The whole file already covers every other node it holds
+                break
+
+    return context_parts
+
+def split_sections(raw_content) -> List[str]:
+    """Splits markdown at its headings; text before the first heading is its own section."""
+    starts = [match.start() for match in _HEADING_PATTERN.finditer(raw_content)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    sections = [raw_content[start:end].strip() for start, end in zip(starts, starts[1:] + [len(raw_content)])]
+    return [section for section in sections if section]
+
+def build_document_context(doc_file, query, max_tokens=None) -> List[str]:
+    """
+    Picks the sections of a matched document that share the most words with the
+    query, within the query.doc_context_tokens budget, and returns them in document order.
+    """
+    remaining = max_tokens or _config.get("doc_context_tokens", 2000)
+    sections = split_sections(doc_file.raw_content)
+    query_words = {word.lower() for word in _WORD_PATTERN.findall(query)}
+
+    def overlap(section):
+        return len(query_words & {word.lower() for word in _WORD_PATTERN.findall(section)})
+
+    ranked = sorted(range(len(sections)), key=lambda i: (-overlap(sections[i]), i))
+    chosen = []
+    for i in ranked:
+        if remaining <= 0:
+            break
+        section = _truncate(sections[i], remaining)
+        chosen.append((i, section))
+        remaining -= estimate_tokens(section)
+    return [section for _, section in sorted(chosen)]
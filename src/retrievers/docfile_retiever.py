@@ -1,64 +1,67 @@
 from typing import List
 from src.ingestion.data_models import DocumentationFile
-from src.utils.mongodb_utils import fetch_document_by_path, fetch_all_documents, fetch_document_doc_by_embedding_id
-from src.utils.logging_utils import log_error
+from src.utils.mongodb_utils import fetch_document_by_path, fetch_all_documents, fetch_document_doc_by_embedding_id, fetch_document_docs_by_embedding_ids
+from src.utils.logging_utils import setup_logger, log_error, log_warning
 
-def fetch_document_by_file_path(file_path: str) -> DocumentationFile:
+logger = setup_logger()
+
+def _to_documentation_file(document) -> DocumentationFile:
     """
     Data transfer object (DTO) transformer from DB docs
     """
-    document = fetch_document_by_path(file_path)
-    
-    if not document:
-        log_error(f"No document found for file_path: {file_path}")
-        return None
-
     return DocumentationFile(
         file_path=document.get('file_path'),
         sections=document.get('sections', []),
         raw_content=document.get('raw_content', ''),
         cleaned_content=document.get('cleaned_content'),
-        api_references=document.get('api_references', ''),
+        api_references=document.get('api_references', []),
         embedding_id=document.get('embedding_id'),
         type=document.get('type', 'DocumentationFile.class')
     )
 
+def fetch_document_by_file_path(file_path: str) -> DocumentationFile:
+    document = fetch_document_by_path(file_path)
+    
+    if not document:
+        log_error(logger, f"No document found for file_path: {file_path}")
+        return None
+
+    return _to_documentation_file(document)
+
 def fetch_document_by_embedding_id(embedding_id: int) -> DocumentationFile:
-    """
-    Data transfer object (DTO) transformer from DB docs
-    """
     document = fetch_document_doc_by_embedding_id(embedding_id)
     
     if not document:
-        log_error(f"No document found for embedding_id: {embedding_id}")
+        log_error(logger, f"No document found for embedding_id: {embedding_id}")
         return None
-    
-    return DocumentationFile(
-        file_path=document.get('file_path'),
-        sections=document.get('sections', []),
-        raw_content=document.get('raw_content', ''),
-        cleaned_content=document.get('cleaned_content'),
-        api_references=document.get('api_references', []),
-        embedding_id=document.get('embedding_id'),
-        type=document.get('type', 'DocumentationFile.class')
-    )
 
-def fetch_all_documents_from_db() -> List[DocumentationFile]:
+    return _to_documentation_file(document)
+
+def fetch_documents_by_embedding_ids(embedding_ids) -> List[DocumentationFile]:
     """
-    Data transfer object (DTO) transformer from DB docs
+    Resolves FAISS hits to documentation files in one round trip, in rank order
+    and without duplicates.
     """
-    documents = fetch_all_documents()
-    
-    document_files = []
-    for document in documents:
-        document_files.append(DocumentationFile(
-            file_path=document.get('file_path'),
-            sections=document.get('sections', []),
-            raw_content=document.get('raw_content', ''),
-            cleaned_content=document.get('cleaned_content'),
-            api_references=document.get('api_references', ''),
-            embedding_id=document.get('embedding_id'),
-            type=document.get('type', 'DocumentationFile.class')
-        ))
-    
-    return document_files
\ No newline at end of file
+    # FAISS pads rows with -1 when fewer than k vectors match
+    embedding_ids = [int(i) for i in embedding_ids if i >= 0]
+    if not embedding_ids:
+        return []
+
+    owners = {document.get('embedding_id'): document for document in fetch_document_docs_by_embedding_ids(embedding_ids)}
+
+    documents = []
+    seen = set()
+    for embedding_id in embedding_ids:
+        document = owners.get(embedding_id)
+        if document is None or document['file_path'] in seen:
+            continue
+        seen.add(document['file_path'])
+        documents.append(_to_documentation_file(document))
+
+    missing = sum(embedding_id not in owners for embedding_id in embedding_ids)
+    if missing:
+        log_warning(logger, f"No document found for {missing} of {len(embedding_ids)} embedding ids")
+    return documents
+
+def fetch_all_documents_from_db() -> List[DocumentationFile]:
+    return [_to_documentation_file(document) for document in fetch_all_documents()]
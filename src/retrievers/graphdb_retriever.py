@@ -15,6 +15,13 @@ def get_function_file(function_name):
         return graph.nodes[function_name].get("file_path", None)
     return None
 
+def get_entity(entity_name):
+    """Returns the graph attributes of an entity (file_path, line span, signature, ...), or None."""
+    graph = _get_graph()
+    if graph.has_node(entity_name):
+        return dict(graph.nodes[entity_name])
+    return None
+
 def get_call_line_number(caller, callee):
     graph = _get_graph()
     if graph.has_edge(caller, callee):
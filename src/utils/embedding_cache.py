@@ -0,0 +1,123 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+from .logging_utils import setup_logger
+from .config_loader import load_config
+
+# Setup Logging
+logger = setup_logger()
+
+# Load configuration once when module is imported
+_config = load_config().get("embedding_cache", {})
+
+_embedding_cache = None
+
+def get_embedding_cache():
+    """Returns the shared on-disk embedding cache, or None when it is disabled."""
+    global _embedding_cache
+    if _embedding_cache is None and _config.get("enabled", False):
+        _embedding_cache = EmbeddingCache(_config["path"], _config.get("max_entries", 1_000_000))
+    return _embedding_cache
+
+def chunk_hash(input_ids):
+    """Content hash of a chunk's model input ids."""
+    return hashlib.sha256(np.asarray(input_ids, dtype=np.int64).tobytes()).hexdigest()
+
+class EmbeddingCache:
+    """
+    Content-addressed store of chunk embeddings keyed by (model name, chunk hash),
+    so unchanged chunks are never re-embedded. Backed by SQLite; once max_entries
+    is exceeded the least recently used entries are evicted.
+    """
+    def __init__(self, path, max_entries=1_000_000):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL, chunk_hash TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL,"
+            " PRIMARY KEY (model, chunk_hash))"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._connection.commit()
+        # Upper bound on the row count, recounted only when it crosses max_entries
+        self._entries = self._connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        logger.info(f"Embedding cache opened at {path} ({self._entries} entries)")
+
+    def get_many(self, model_name, input_ids_list):
+        """Returns a cached embedding or None for every chunk, in order."""
+        hashes = [chunk_hash(input_ids) for input_ids in input_ids_list]
+        found = {}
+        with self._lock:
+            for start in range(0, len(hashes), 500):
+                batch = hashes[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._connection.execute(
+                    f"SELECT chunk_hash, vector FROM embeddings WHERE model = ? AND chunk_hash IN ({placeholders})",
+                    [model_name, *batch],
+                )
+                found.update({h: np.frombuffer(vector, dtype=np.float32) for h, vector in rows})
+
+            if found:
+                now = time.time()
+                self._connection.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND chunk_hash = ?",
+                    [(now, model_name, h) for h in found],
+                )
+                self._connection.commit()
+
+        embeddings = [found.get(h) for h in hashes]
+        hits = sum(embedding is not None for embedding in embeddings)
+        self.hits += hits
+        self.misses += len(embeddings) - hits
+        return embeddings
+
+    def put_many(self, model_name, input_ids_list, embeddings):
+        """Stores freshly computed embeddings and evicts old entries if over capacity."""
+        now = time.time()
+        rows = [
+            (model_name, chunk_hash(input_ids), np.asarray(embedding, dtype=np.float32).tobytes(), now)
+            for input_ids, embedding in zip(input_ids_list, embeddings)
+        ]
+        with self._lock:
+            self._connection.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            self._entries += len(rows)
+            if self._entries > self.max_entries:
+                self._evict()
+            self._connection.commit()
+
+    def _evict(self):
+        count = self._connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self._entries = count
+        if count <= self.max_entries:
+            return
+        # Evict down to 90% of capacity so eviction does not run on every insert
+        excess = count - int(self.max_entries * 0.9)
+        self._connection.execute(
+            "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,),
+        )
+        self._entries = count - excess
+        logger.info(f"Evicted {excess} entries from the embedding cache.")
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def log_stats(self):
+        stats = self.stats()
+        logger.info(f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses "
+                    f"({stats['hit_rate']:.1%} hit rate).")
@@ -1,79 +1,468 @@
 import faiss
+import json
 import numpy as np
 import os
+import time
 from .logging_utils import setup_logger
 from .config_loader import load_config
 
 # Setup Logging
 logger = setup_logger()
 
+# Names of the per-class vector spaces; code (CodeBERT) and docs (MPNet) never share an index
+CODE_INDEX = "code"
+DOC_INDEX = "docs"
+
 # Load configuration once when module is imported
 _config = load_config()["faiss"]
-_index_path = _config["index_path"]
+_index_paths = _config.get("indices") or {
+    CODE_INDEX: _config["index_path"],
+    DOC_INDEX: os.path.join(os.path.dirname(_config["index_path"]), "doc_index.faiss"),
+}
 _embedding_dimension = _config["embedding_dimension"]
+_index_type = _config.get("index_type", "Flat")
+_train_sample_size = _config.get("train_sample_size", 100000)
+_nprobe = _config.get("nprobe")
+_ef_search = _config.get("efSearch")
+_mmap_for_serving = _config.get("mmap_for_serving", False)
+_buffered_writes = _config.get("buffered_writes", False)
+_checkpoint_vectors = _config.get("checkpoint_vectors", 50000)
+_checkpoint_seconds = _config.get("checkpoint_seconds", 300)
+
+# Per-index state, keyed by index name
+_faiss_indices = {}
+_read_only_faiss_indices = {}
+_next_ids = {}
+_untrained_batches = {}  # name -> [(embeddings, ids)] held back until the index is trained
+_unsaved_changes = {}
+_last_save_times = {}
+
+def _index_path(name):
+    if name not in _index_paths:
+        raise ValueError(f"Unknown FAISS index '{name}'. Configured indices: {', '.join(_index_paths)}")
+    return _index_paths[name]
+
+def _get_faiss_index(name=CODE_INDEX, read_only=False):
+    indices = _read_only_faiss_indices if read_only else _faiss_indices
+    if name not in indices:
+        indices[name] = load_faiss_index(name, read_only=read_only)
+    return indices[name]
+
+def _ivf(index):
+    """The IVF index inside index, or None for flat and graph indexes."""
+    try:
+        return faiss.extract_index_ivf(index)
+    except RuntimeError:
+        return None
+
+def create_faiss_index(index_type=None):
+    """
+    Creates an index that stores vectors under stable 64-bit ids. index_type is a
+    faiss index_factory description such as "Flat", "HNSW32", "IVF4096,Flat",
+    "IVF4096,SQ8" or "IVF4096,PQ64"; it defaults to faiss.index_type in config.yaml.
+
+    IVF indexes keep the ids natively, with a hashtable direct map for removal and
+    reconstruction. Wrapping them in IndexIDMap2 would break ids on removal: the
+    id map is compacted while the inverted lists keep their old internal ids.
+    Flat and HNSW indexes are wrapped in IndexIDMap2.
+    """
+    index_type = index_type or _index_type
+    logger.info(f"Creating a new FAISS index ({index_type}).")
+    index = faiss.index_factory(_embedding_dimension, index_type)
+    ivf = _ivf(index)
+    if ivf is not None:
+        ivf.set_direct_map_type(faiss.DirectMap.Hashtable)
+    else:
+        index = faiss.IndexIDMap2(index)
+    _apply_search_parameters(index, _nprobe, _ef_search)
+    return index
+
+def _has_stable_ids(index):
+    if isinstance(index, faiss.IndexIDMap):
+        return True
+    ivf = _ivf(index)
+    return ivf is not None and ivf.direct_map.type == faiss.DirectMap.Hashtable
+
+def _stored_ids(index):
+    """Returns the ids of every vector in the index."""
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.vector_to_array(index.id_map).astype(np.int64)
+    invlists = _ivf(index).invlists
+    ids = [faiss.rev_swig_ptr(invlists.get_ids(i), invlists.list_size(i)).copy()
+           for i in range(invlists.nlist) if invlists.list_size(i)]
+    return np.concatenate(ids).astype(np.int64) if ids else np.empty(0, dtype=np.int64)
+
+def _stored_vectors(index):
+    """Returns (ids, vectors) of everything in the index, reconstructed from its codes."""
+    ids = _stored_ids(index)
+    if not len(ids):
+        return ids, np.empty((0, _embedding_dimension), dtype=np.float32)
+    if isinstance(index, faiss.IndexIDMap):
+        if _ivf(index) is not None:
+            raise RuntimeError("This IndexIDMap2-wrapped IVF index lost its id mapping to earlier removals; "
+                               "run a full ingestion to rebuild it.")
+        return ids, faiss.downcast_index(index.index).reconstruct_n(0, index.ntotal)
+    return ids, index.reconstruct_batch(ids)
 
-_faiss_index = None
+def _unwrap_ivf(index):
+    """
+    Converts an IndexIDMap2-wrapped IVF index (written before IVF kept ids natively)
+    into a native one by rewriting the ids in its inverted lists. That is only
+    possible while no vector has been removed, i.e. the internal ids are still
+    exactly the positions in the id map; otherwise the index is returned unchanged.
+    """
+    id_map = faiss.vector_to_array(index.id_map).astype(np.int64)
+    native = faiss.clone_index(faiss.downcast_index(index.index))
+    invlists = faiss.extract_index_ivf(native).invlists
+    lists = [faiss.rev_swig_ptr(invlists.get_ids(i), invlists.list_size(i))
+             for i in range(invlists.nlist) if invlists.list_size(i)]
+    internal = np.sort(np.concatenate(lists)) if lists else np.empty(0, dtype=np.int64)
+    if not np.array_equal(internal, np.arange(len(id_map))):
+        logger.error("FAISS IVF index ids were shifted by earlier removals; run a full ingestion to rebuild it.")
+        return index
 
-def _get_faiss_index():
-    global _faiss_index
-    if _faiss_index is None:
-        _faiss_index = load_faiss_index()
-    return _faiss_index
+    for ids in lists:
+        ids[:] = id_map[ids]
+    faiss.extract_index_ivf(native).set_direct_map_type(faiss.DirectMap.Hashtable)
+    logger.info(f"Converted IVF index with {native.ntotal} vectors to native ids.")
+    return native
 
-def create_faiss_index():
-    logger.info("Creating a new FAISS index.")
-    return faiss.IndexFlatL2(_embedding_dimension)
+def _apply_search_parameters(index, nprobe=None, ef_search=None):
+    """Sets query-time knobs on the index types that have them; others ignore them."""
+    ivf = _ivf(index)
+    if ivf is not None and nprobe:
+        ivf.nprobe = nprobe
 
-def load_faiss_index():
-    if os.path.exists(_index_path):
-        logger.info(f"Loading FAISS index from {_index_path}")
-        return faiss.read_index(_index_path)
-    
-    logger.info("No FAISS index found. Creating a new one.")
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    if hasattr(inner, "hnsw") and ef_search:
+        inner.hnsw.efSearch = ef_search
+
+def _migrate_to_id_map(index):
+    """
+    Copies a positional index into a Flat one with stable ids, keeping each vector's
+    position as its id. Flat needs no training; rebuild_faiss_index converts it to
+    the configured type afterwards.
+    """
+    logger.info(f"Migrating positional FAISS index with {index.ntotal} vectors to stable ids (Flat).")
+    migrated = create_faiss_index("Flat")
+    if index.ntotal:
+        inner = faiss.downcast_index(index)
+        if isinstance(inner, faiss.IndexIVF):
+            inner.make_direct_map()
+        migrated.add_with_ids(inner.reconstruct_n(0, index.ntotal), np.arange(index.ntotal, dtype=np.int64))
+    return migrated
+
+def _read_index_for_serving(path):
+    """
+    Memory-maps the index read-only, so startup does not copy it into RAM and
+    every worker on the host shares the same page cache. IO_FLAG_MMAP_IFC maps
+    the stored codes of flat, HNSW, scalar-quantized and IVF indexes alike
+    (IO_FLAG_MMAP alone only maps IVF inverted lists); indexes that still
+    cannot be mapped are read into memory with a warning.
+    """
+    if not hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+        logger.warning(f"This faiss build cannot memory-map index codes; reading {path} into memory.")
+        return faiss.read_index(path)
+    try:
+        return faiss.read_index(path, faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError as e:
+        logger.warning(f"FAISS index {path} cannot be memory-mapped, reading it into memory: {e}")
+        return faiss.read_index(path)
+
+def load_faiss_index(name=CODE_INDEX, read_only=False):
+    """
+    Loads the named index from disk. read_only is meant for serving processes: the
+    index is memory-mapped when faiss.mmap_for_serving is set and nothing is written back.
+    """
+    path = _index_path(name)
+    if os.path.exists(path):
+        logger.info(f"Loading FAISS index from {path}" + (" (read-only)" if read_only else ""))
+        index = _read_index_for_serving(path) if read_only and _mmap_for_serving else faiss.read_index(path)
+        if not _has_stable_ids(index):
+            index = _migrate_to_id_map(index)
+            if not read_only:
+                save_faiss_index(index, name)
+        elif not read_only and isinstance(index, faiss.IndexIDMap) and _ivf(index) is not None:
+            unwrapped = _unwrap_ivf(index)
+            if unwrapped is not index:
+                index = unwrapped
+                save_faiss_index(index, name)
+        _apply_search_parameters(index, _nprobe, _ef_search)
+        return index
+
+    logger.info(f"No FAISS index found for '{name}'. Creating a new one.")
     index = create_faiss_index()
-    save_faiss_index(index)
+    if not read_only:
+        save_faiss_index(index, name)
     return index
 
-def save_faiss_index(index):
-    os.makedirs(os.path.dirname(_index_path), exist_ok=True)
-    faiss.write_index(index, _index_path)
-    logger.info(f"FAISS index saved to {_index_path}")
+def _load_next_id(name, index):
+    """
+    Next free id: the sidecar's next_id, but never below the largest stored id + 1.
+    The index and the sidecar are written one after the other, so a crash between
+    the two leaves a sidecar that lags behind the index.
+    """
+    next_id = 0
+    meta_path = f"{_index_path(name)}.meta.json"
+    if os.path.exists(meta_path):
+        with open(meta_path, "r") as f:
+            next_id = json.load(f)["next_id"]
+    ids = _stored_ids(index)
+    return max(next_id, int(ids.max()) + 1 if len(ids) else 0)
+
+def _allocate_ids(name, index, count):
+    """Hands out count new ids of the named index. Ids are never reused, even after removal."""
+    if name not in _next_ids:
+        _next_ids[name] = _load_next_id(name, index)
+    ids = np.arange(_next_ids[name], _next_ids[name] + count, dtype=np.int64)
+    _next_ids[name] += count
+    return ids
+
+def save_faiss_index(index, name=CODE_INDEX):
+    path = _index_path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write to a temp file and rename so a crash never leaves a torn index behind
+    tmp_path = f"{path}.tmp"
+    faiss.write_index(index, tmp_path)
+    os.replace(tmp_path, path)
+    if name in _next_ids:
+        meta_path = f"{path}.meta.json"
+        with open(f"{meta_path}.tmp", "w") as f:
+            json.dump({"next_id": _next_ids[name]}, f)
+        os.replace(f"{meta_path}.tmp", meta_path)
+    _unsaved_changes[name] = 0
+    _last_save_times[name] = time.monotonic()
+    logger.info(f"FAISS index saved to {path}")
+
+def _record_changes(name, index, count):
+    """
+    Persists the index after a mutation. In buffered mode the write is deferred
+    until checkpoint_vectors changes or checkpoint_seconds have accumulated.
+    """
+    _unsaved_changes[name] = _unsaved_changes.get(name, 0) + count
+    since_last_save = time.monotonic() - _last_save_times.setdefault(name, time.monotonic())
+    if not _buffered_writes:
+        save_faiss_index(index, name)
+    elif _unsaved_changes[name] >= _checkpoint_vectors or since_last_save >= _checkpoint_seconds:
+        logger.info(f"FAISS checkpoint of '{name}' after {_unsaved_changes[name]} unsaved changes.")
+        save_faiss_index(index, name)
+
+def _add_vectors(name, index, embeddings):
+    """
+    Adds embeddings under freshly allocated ids. Indexes that need training
+    (IVF, PQ) hold vectors back until train_sample_size of them are available.
+    """
+    ids = _allocate_ids(name, index, len(embeddings))
+    if index.is_trained:
+        index.add_with_ids(embeddings, ids)
+        _record_changes(name, index, len(embeddings))
+        return ids
+
+    pending = _untrained_batches.setdefault(name, [])
+    pending.append((embeddings, ids))
+    if sum(len(batch) for batch, _ in pending) >= _train_sample_size:
+        _train_and_add_pending(name, index)
+    return ids
+
+def _training_sample(embeddings):
+    if len(embeddings) <= _train_sample_size:
+        return embeddings
+    return embeddings[np.random.default_rng(0).choice(len(embeddings), _train_sample_size, replace=False)]
 
-def add_embeddings_to_index(embeddings):
+def _min_training_vectors(index):
+    """Fewest vectors the index can be trained on: one per IVF list and one per PQ centroid."""
+    ivf = _ivf(index)
+    minimum = ivf.nlist if ivf is not None else 1
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    if hasattr(inner, "pq"):
+        minimum = max(minimum, inner.pq.ksub)
+    return minimum
+
+def _train_and_add_pending(name, index):
+    """
+    Trains the index on a sample of the held-back vectors, then adds all of them.
+    With too few vectors to train on, they go into a Flat index that replaces it.
+    """
+    pending = _untrained_batches.pop(name, [])
+    embeddings = np.vstack([batch for batch, _ in pending])
+    ids = np.concatenate([batch_ids for _, batch_ids in pending])
+
+    minimum = _min_training_vectors(index)
+    if len(embeddings) < minimum:
+        logger.warning(f"FAISS index '{name}' needs at least {minimum} vectors to train but only {len(embeddings)} "
+                       f"are available; storing them in a Flat index instead. Convert it with "
+                       f"scripts/rebuild_faiss_index.py once there is enough data.")
+        index = create_faiss_index("Flat")
+        _faiss_indices[name] = index
+    else:
+        sample = _training_sample(embeddings)
+        start_time = time.perf_counter()
+        index.train(sample)
+        logger.info(f"Trained FAISS index '{name}' on {len(sample)} vectors in {time.perf_counter() - start_time:.2f}s.")
+    index.add_with_ids(embeddings, ids)
+    _record_changes(name, index, len(embeddings))
+
+def flush_faiss_index(name=None):
+    """
+    Writes buffered changes of the named index (all indices if None) to disk,
+    training an index first if it still needs it.
+    """
+    for index_name in ([name] if name else list(_faiss_indices)):
+        index = _faiss_indices.get(index_name)
+        if index is None:
+            continue
+        if _untrained_batches.get(index_name):
+            _train_and_add_pending(index_name, index)
+            # Training may have replaced the index with a Flat one
+            index = _faiss_indices[index_name]
+        if _unsaved_changes.get(index_name):
+            save_faiss_index(index, index_name)
+
+def rebuild_faiss_index(index_type=None, name=CODE_INDEX):
+    """
+    Rebuilds the named index into index_type (e.g. a flat index into an IVF or
+    HNSW one), keeping every vector's id. The new index replaces the old one on disk.
+    """
+    flush_faiss_index(name)
+    ids, embeddings = _stored_vectors(_get_faiss_index(name))
+
+    new_index = create_faiss_index(index_type)
+    if not new_index.is_trained:
+        new_index.train(_training_sample(embeddings))
+    if len(ids):
+        new_index.add_with_ids(embeddings, ids)
+
+    save_faiss_index(new_index, name)
+    _faiss_indices[name] = new_index
+    logger.info(f"Rebuilt FAISS index '{name}' with {new_index.ntotal} vectors as {index_type or _index_type}.")
+    return new_index
+
+def reset_faiss_index(name=CODE_INDEX):
+    """Replaces the named index with an empty one and restarts its ids at 0, for full re-ingestion."""
+    _untrained_batches.pop(name, None)
+    _faiss_indices[name] = create_faiss_index()
+    _next_ids[name] = 0
+    save_faiss_index(_faiss_indices[name], name)
+    logger.info(f"FAISS index '{name}' reset for a full ingestion run.")
+
+def add_embeddings_to_index(embeddings, name=CODE_INDEX):
     if not isinstance(embeddings, np.ndarray):
         raise ValueError("Embeddings must be a numpy array.")
-    
+
     if embeddings.ndim != 2 or embeddings.shape[1] != _embedding_dimension:
         raise ValueError(f"Embeddings must have shape (n, {_embedding_dimension}).")
 
-    index = _get_faiss_index()
-    index.add(embeddings)
-    save_faiss_index(index)
+    return _add_vectors(name, _get_faiss_index(name), embeddings)
 
-def search_similar_vectors(query_embedding, k=5):
+def search_similar_vectors(query_embedding, k=5, name=CODE_INDEX):
+    """
+    Searches the named index with a single (d,) query or an (n, d) batch of queries.
+    A batch returns (n, k) ids and distances, one row per query, from a single FAISS call.
+    """
     if not isinstance(query_embedding, np.ndarray):
         raise ValueError("Query embedding must be a numpy array.")
-    
-    if query_embedding.shape != (_embedding_dimension,):
-        raise ValueError(f"Query embedding must have shape ({_embedding_dimension},).")
 
-    query_embedding = np.expand_dims(query_embedding, axis=0)
-    index = _get_faiss_index()
-    
-    distances, indices = index.search(query_embedding, k)
-    return indices[0], distances[0]
+    single = query_embedding.ndim == 1
+    queries = np.expand_dims(query_embedding, axis=0) if single else query_embedding
+    if queries.ndim != 2 or queries.shape[1] != _embedding_dimension:
+        raise ValueError(f"Query embedding must have shape ({_embedding_dimension},) or (n, {_embedding_dimension}).")
+
+    index = _get_faiss_index(name)
+    distances, indices = index.search(np.ascontiguousarray(queries, dtype=np.float32), k)
+    if single:
+        return indices[0], distances[0]
+    return indices, distances
 
 class FAISSManager:
-    def __init__(self):
-        self.index = _get_faiss_index()
-        
-    def add_embeddings(self, embeddings):
+    """
+    Manages one FAISS index per embedding class (see faiss.indices in config.yaml).
+    Every operation names the index it targets, so code searches never scan
+    documentation vectors and vice versa.
+    """
+    def __init__(self, read_only=False):
+        # Serving processes use read_only so the indices can be memory-mapped and shared
+        self.read_only = read_only
+        for name in _index_paths:
+            _get_faiss_index(name, read_only=read_only)
+
+    @property
+    def indices(self):
+        """The loaded indices by name; an index replaced by training fallback or reload is picked up here."""
+        return _read_only_faiss_indices if self.read_only else _faiss_indices
+
+    def reload(self):
+        """
+        Re-reads every index from disk, for serving processes that outlive an
+        ingestion run. Searches already running keep using the old index objects.
+        """
+        if not self.read_only:
+            raise RuntimeError("Only read-only FAISSManagers reload; a writable one owns the indices it writes.")
+        for name in _index_paths:
+            _read_only_faiss_indices[name] = load_faiss_index(name, read_only=True)
+
+    def _check_writable(self):
+        if self.read_only:
+            raise RuntimeError("FAISSManager was opened read-only; use a writable manager for ingestion.")
+
+    def get_index(self, index_name=CODE_INDEX):
+        if index_name not in self.indices:
+            raise ValueError(f"Unknown FAISS index '{index_name}'. Configured indices: {', '.join(self.indices)}")
+        return self.indices[index_name]
+
+    def add_embeddings(self, embeddings, index_name=CODE_INDEX):
+        """Adds embeddings to the named index and returns the stable ids assigned to them."""
+        self._check_writable()
         if not isinstance(embeddings, np.ndarray):
             raise ValueError("Embeddings must be a numpy array.")
-        self.index.add(embeddings)
-        save_faiss_index(self.index)
-        
-    def search(self, query_embedding, k=5):
-        query_embedding = np.expand_dims(query_embedding, axis=0)
-        distances, indices = self.index.search(query_embedding, k)
-        return indices[0], distances[0]
\ No newline at end of file
+        return _add_vectors(index_name, self.get_index(index_name), embeddings)
+
+    def remove_embeddings(self, ids, index_name=CODE_INDEX):
+        """
+        Removes vectors by their stable ids; other ids are unaffected. Graph-based
+        indexes (HNSW) cannot remove vectors, so there they stay as orphans whose
+        metadata is gone and callers skip unresolved hits.
+        """
+        self._check_writable()
+        if not ids:
+            return 0
+        index = self.get_index(index_name)
+        try:
+            removed = index.remove_ids(np.asarray(ids, dtype=np.int64))
+        except RuntimeError as e:
+            logger.warning(f"FAISS index '{index_name}' cannot remove vectors, leaving {len(ids)} orphaned: {e}")
+            return 0
+        _record_changes(index_name, index, removed)
+        return removed
+
+    def reset(self):
+        """Empties every index; a full ingestion run must not keep vectors from earlier runs."""
+        self._check_writable()
+        for name in _index_paths:
+            reset_faiss_index(name)
+
+    def flush(self):
+        """Commits buffered additions and removals of every index to disk."""
+        if not self.read_only:
+            flush_faiss_index()
+
+    def set_search_parameters(self, nprobe=None, ef_search=None, index_name=None):
+        """
+        Tunes the recall/latency trade-off of IVF (nprobe) and HNSW (efSearch)
+        indexes; applies to every index when index_name is None.
+        """
+        for name in ([index_name] if index_name else self.indices):
+            _apply_search_parameters(self.get_index(name), nprobe, ef_search)
+
+    def search(self, query_embedding, k=5, index_name=CODE_INDEX):
+        indices, distances = self.search_batch(np.expand_dims(query_embedding, axis=0), k, index_name)
+        return indices[0], distances[0]
+
+    def search_batch(self, query_embeddings, k=5, index_name=CODE_INDEX):
+        """
+        Searches the named index with an (n, d) matrix of queries in one FAISS call.
+        Returns (n, k) ids and distances, one row per query.
+        """
+        if not isinstance(query_embeddings, np.ndarray) or query_embeddings.ndim != 2:
+            raise ValueError("Query embeddings must be a 2-D numpy array.")
+        distances, indices = self.get_index(index_name).search(np.ascontiguousarray(query_embeddings, dtype=np.float32), k)
+        return indices, distances
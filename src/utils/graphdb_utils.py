@@ -1,6 +1,7 @@
 import networkx as nx
 import pickle
 import os
+import time
 from .logging_utils import setup_logger
 from .config_loader import load_config
 
@@ -10,8 +11,13 @@ logger = setup_logger()
 # Load configuration once when module is imported
 _config = load_config()["graphdb"]
 _graph_storage_path = _config["graph_storage_path"]
+_buffered_writes = _config.get("buffered_writes", False)
+_checkpoint_mutations = _config.get("checkpoint_mutations", 1000)
+_checkpoint_seconds = _config.get("checkpoint_seconds", 300)
 
 _graph = None
+_unsaved_mutations = 0
+_last_save_time = time.monotonic()
 
 def _get_graph():
     global _graph
@@ -35,15 +41,41 @@ def load_graph():
     return graph
 
 def save_graph(graph):
+    global _unsaved_mutations, _last_save_time
+    start_time = time.perf_counter()
     os.makedirs(os.path.dirname(_graph_storage_path), exist_ok=True)
-    with open(_graph_storage_path, "wb") as f:
-        pickle.dump(graph, f)
-    logger.info(f"GraphDB saved to {_graph_storage_path}")
+    # Write to a temp file and rename so a crash never leaves a torn pickle behind
+    tmp_path = f"{_graph_storage_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(graph, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, _graph_storage_path)
+    _unsaved_mutations = 0
+    _last_save_time = time.monotonic()
+    logger.info(f"GraphDB saved to {_graph_storage_path} in {time.perf_counter() - start_time:.3f}s "
+                f"({graph.number_of_nodes()} nodes, {graph.number_of_edges()} edges)")
+
+def record_graph_changes(graph, count=1):
+    """
+    Persists the graph after a mutation. In buffered mode the write is deferred
+    until checkpoint_mutations changes or checkpoint_seconds have accumulated.
+    """
+    global _unsaved_mutations
+    _unsaved_mutations += count
+    if not _buffered_writes:
+        save_graph(graph)
+    elif _unsaved_mutations >= _checkpoint_mutations or time.monotonic() - _last_save_time >= _checkpoint_seconds:
+        logger.info(f"GraphDB checkpoint after {_unsaved_mutations} unsaved changes.")
+        save_graph(graph)
+
+def flush_graph():
+    """Writes any buffered graph changes to disk."""
+    if _unsaved_mutations and _graph is not None:
+        save_graph(_graph)
 
 def add_dependency(source_entity, target_entity):
     graph = _get_graph()
     graph.add_edge(source_entity, target_entity)
-    save_graph(graph)
+    record_graph_changes(graph)
 
 def get_dependencies(entity_name):
     graph = _get_graph()
@@ -57,6 +89,12 @@ def entity_exists(entity_name):
     graph = _get_graph()
     return graph.has_node(entity_name)
 
+def reload_graph():
+    """Re-reads the graph from disk, for serving processes that outlive an ingestion run."""
+    global _graph
+    _graph = load_graph()
+    return _graph
+
 def clear_graph():
     global _graph
     _graph = create_graph()
@@ -67,6 +105,11 @@ def get_all_entities():
     graph = _get_graph()
     return list(graph.nodes())
 
+def get_typed_entities():
+    """Returns (name, type) of every node that has a definition, skipping bare callees."""
+    graph = _get_graph()
+    return [(name, entity_type) for name, entity_type in graph.nodes(data="type") if entity_type]
+
 def get_all_dependencies():
     graph = _get_graph()
     return list(graph.edges())
@@ -1,4 +1,7 @@
-from pymongo import MongoClient
+import time
+import bson
+from pymongo import ASCENDING, MongoClient, ReplaceOne
+from pymongo.errors import BulkWriteError, PyMongoError
 
 from .logging_utils import setup_logger
 from .config_loader import load_config
@@ -12,9 +15,80 @@ _client = MongoClient(_config["uri"], maxPoolSize=50)
 _db = _client[_config["database"]]
 _collection = _db[_config["metadata_collection"]]
 
+# Indexes backing the retrieval lookups, by name
+REQUIRED_INDEXES = {
+    "embedding_ids_type": [("embedding_ids", ASCENDING), ("type", ASCENDING)],  # multikey
+    "embedding_id_type": [("embedding_id", ASCENDING), ("type", ASCENDING)],
+    "type_file_path": [("type", ASCENDING), ("file_path", ASCENDING)],
+}
+
+# Filter shapes issued by the ingestion and query paths, checked with explain()
+QUERY_SHAPES = {
+    "codefile_by_embedding_id": {"embedding_ids": 0, "type": "CodeFile.class"},
+    "document_by_embedding_id": {"embedding_id": 0, "type": "DocumentationFile.class"},
+    "codefiles_by_embedding_ids": {"embedding_ids": {"$in": [0, 1]}, "type": "CodeFile.class"},
+    "documents_by_embedding_ids": {"embedding_id": {"$in": [0, 1]}, "type": "DocumentationFile.class"},
+    "codefile_by_path": {"file_path": "", "type": "CodeFile.class"},
+    "document_by_path": {"file_path": "", "type": "DocumentationFile.class"},
+    "all_codefiles": {"type": "CodeFile.class"},
+    "all_documents": {"type": "DocumentationFile.class"},
+    "files_by_path": {"type": {"$in": ["CodeFile.class", "DocumentationFile.class"]}, "file_path": ""},
+}
+
 def get_collection():
     return _collection
 
+def missing_indexes():
+    """Returns the names of the indexes in REQUIRED_INDEXES that do not exist with the expected keys."""
+    existing = _collection.index_information()
+    return [name for name, keys in REQUIRED_INDEXES.items()
+            if name not in existing or [tuple(k) for k in existing[name]["key"]] != keys]
+
+def ensure_indexes():
+    """Creates the indexes in REQUIRED_INDEXES if missing and verifies that they exist."""
+    for name, keys in REQUIRED_INDEXES.items():
+        _collection.create_index(keys, name=name)
+
+    missing = missing_indexes()
+    if missing:
+        raise RuntimeError(f"MongoDB indexes could not be verified: {missing}")
+    logger.info(f"Verified MongoDB indexes: {', '.join(REQUIRED_INDEXES)}")
+
+def verify_indexes():
+    """
+    Checks the retrieval indexes without creating them, for serving processes;
+    index creation is left to ingestion and scripts/check_mongo_indexes.py.
+    Returns True when all of them exist.
+    """
+    missing = missing_indexes()
+    if missing:
+        logger.warning(f"MongoDB indexes missing: {', '.join(missing)}. Retrieval will scan the collection "
+                       "until ingestion or scripts/check_mongo_indexes.py creates them.")
+        return False
+    logger.info(f"Verified MongoDB indexes: {', '.join(REQUIRED_INDEXES)}")
+    return True
+
+def _plan_stages(plan):
+    """Collects every stage name in an explain() plan tree."""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(_plan_stages(item))
+    return stages
+
+def explain_query_shapes():
+    """Returns the winning plan stages of every query shape in QUERY_SHAPES."""
+    results = {}
+    for name, query_filter in QUERY_SHAPES.items():
+        explanation = _collection.find(query_filter).explain()
+        results[name] = _plan_stages(explanation.get("queryPlanner", {}).get("winningPlan", {}))
+    return results
+
 def get_mongodb_client(uri=None):
     if uri is None:
         uri = _config["uri"]
@@ -86,6 +160,24 @@ def fetch_codefile_doc_by_embedding_id(embedding_id):
     }
     return _collection.find_one(query, projection)
 
+def fetch_codefile_docs_by_embedding_ids(embedding_ids):
+    """Fetch every code file owning one of the embedding ids in a single $in query."""
+    query = {"embedding_ids": {"$in": [int(i) for i in embedding_ids]}, "type": "CodeFile.class"}
+    projection = {
+        "_id": 0,
+        "file_path": 1,
+        "raw_code": 1,
+        "cleaned_code": 1,
+        "docstrings": 1,
+        "entities": 1,
+        "function_calls": 1,
+        "imports": 1,
+        "global_variables": 1,
+        "embedding_ids": 1,
+        "type": 1,
+    }
+    return list(_collection.find(query, projection))
+
 # Document Operations (new additions)
 def insert_document_file(document_content):
     """Insert a document file into the collection."""
@@ -139,6 +231,88 @@ def fetch_document_doc_by_embedding_id(embedding_id):
     }
     return _collection.find_one(query, projection)
 
+def fetch_document_docs_by_embedding_ids(embedding_ids):
+    """Fetch every document owning one of the embedding ids in a single $in query."""
+    query = {"embedding_id": {"$in": [int(i) for i in embedding_ids]}, "type": "DocumentationFile.class"}
+    projection = {
+        "_id": 0,
+        "file_path": 1,
+        "sections": 1,
+        "raw_content": 1,
+        "cleaned_content": 1,
+        "api_references": 1,
+        "embedding_id": 1,
+        "type": 1
+    }
+    return list(_collection.find(query, projection))
+
+class BulkWriter:
+    """
+    Buffers file documents and writes them as unordered bulk upserts keyed on
+    (file_path, type), so re-ingesting a file replaces its document instead of
+    duplicating it. The buffer is flushed once it holds max_documents documents or
+    max_bytes of BSON, or when max_seconds have passed since the last flush.
+    """
+    def __init__(self, collection=None, max_documents=None, max_bytes=None, max_seconds=None):
+        self.collection = collection if collection is not None else _collection
+        self.max_documents = max_documents or _config.get("bulk_max_documents", 500)
+        self.max_bytes = max_bytes or _config.get("bulk_max_bytes", 8 * 1024 * 1024)
+        self.max_seconds = max_seconds or _config.get("bulk_max_seconds", 5)
+
+        self._operations = []
+        self._file_paths = []
+        self._buffered_bytes = 0
+        self._last_flush_time = time.monotonic()
+
+        self.batches = 0
+        self.documents_written = 0
+        self.failed_file_paths = []
+
+    def add(self, document):
+        """Buffers a CodeFile/DocumentationFile document for upsert."""
+        key = {"file_path": document["file_path"], "type": document["type"]}
+        self._operations.append(ReplaceOne(key, document, upsert=True))
+        self._file_paths.append(document["file_path"])
+        self._buffered_bytes += len(bson.encode(document))
+
+        if (len(self._operations) >= self.max_documents
+                or self._buffered_bytes >= self.max_bytes
+                or time.monotonic() - self._last_flush_time >= self.max_seconds):
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the buffered documents. Because the bulk write is unordered, a failing
+        document does not stop the rest of the batch; failed file paths are collected
+        in failed_file_paths.
+        """
+        self._last_flush_time = time.monotonic()
+        if not self._operations:
+            return
+
+        operations, file_paths = self._operations, self._file_paths
+        self._operations, self._file_paths, self._buffered_bytes = [], [], 0
+
+        start_time = time.perf_counter()
+        try:
+            self.collection.bulk_write(operations, ordered=False)
+            failed = []
+        except BulkWriteError as e:
+            write_errors = e.details.get("writeErrors", [])
+            failed = [file_paths[error["index"]] for error in write_errors]
+            for error in write_errors[:5]:
+                logger.error(f"Bulk write failed for {file_paths[error['index']]}: {error.get('errmsg')}")
+        except PyMongoError as e:
+            failed = file_paths
+            logger.error(f"Bulk write of {len(operations)} documents failed: {e}")
+        latency = time.perf_counter() - start_time
+
+        self.batches += 1
+        self.documents_written += len(operations) - len(failed)
+        self.failed_file_paths.extend(failed)
+        logger.info(f"Bulk wrote {len(operations) - len(failed)}/{len(operations)} documents in {latency * 1000:.1f}ms"
+                    + (f" ({len(failed)} failed)" if failed else ""))
+
 def insert_metadata(metadata_list):
     if not isinstance(metadata_list, list):
         metadata_list = [metadata_list]
@@ -0,0 +1,6 @@
+# Rough characters per token for English text and source code
+_CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate used to keep prompts within a budget without loading a tokenizer."""
+    return (len(text) + _CHARS_PER_TOKEN - 1) // _CHARS_PER_TOKEN